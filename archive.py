@@ -0,0 +1,129 @@
+"""
+Zip archives written while a task runs.
+
+The MSD workbooks used to be saved to a scratch directory, zipped one by
+one at the end and deleted. `ArchiveWriter` instead takes each artifact as
+soon as it exists and writes it straight into its zip entry; the ECR zip is
+written the same way from the statement store (ecr_store.py). The archive
+is built as "<name>.zip.part" and renamed over the final name only by
+`finish()`, so a crashed or failed run never leaves a truncated zip behind.
+
+Every archive carries a random id in its zip comment, and the MSD journal
+records the id next to each workbook. A resumed MSD run appends only to a
+finished archive with the id its journal names, skipping the workbooks
+already in it; any other zip of the same name (e.g. from an older batch) is
+replaced. An archive that was still ".part" when the process died cannot be
+read back, so its UANs are fetched again. ECR runs need no resume: each one
+builds a fresh zip from the store.
+
+Compression comes from EPFO_ZIP_COMPRESSION (stored, deflate or lzma) and
+EPFO_ZIP_LEVEL (0-9, used by deflate; zipfile has no level for lzma).
+"""
+import logging
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from sinks import ExcelSink
+
+COMPRESSION_METHODS = {'stored': zipfile.ZIP_STORED, 'deflate': zipfile.ZIP_DEFLATED, 'lzma': zipfile.ZIP_LZMA}
+ZIP_COMPRESSION = os.environ.get("EPFO_ZIP_COMPRESSION", "deflate").lower()
+ZIP_LEVEL = int(os.environ.get("EPFO_ZIP_LEVEL", 6))
+
+
+class ArchiveWriter:
+    """Writes entries into a zip as they are produced. Safe to call from several threads."""
+
+    def __init__(self, path, compression=ZIP_COMPRESSION, level=ZIP_LEVEL, resume_id=None):
+        """`resume_id`: append to the finished archive at `path` if it carries this id, otherwise start afresh."""
+        if compression not in COMPRESSION_METHODS:
+            raise ValueError(f"Unknown zip compression '{compression}'. Use one of: {', '.join(COMPRESSION_METHODS)}")
+        self.path = Path(path)
+        self.part_path = self.path.with_name(self.path.name + ".part")
+        method = COMPRESSION_METHODS[compression]
+        mode = 'w'
+        if resume_id and self.path.exists():
+            if archive_id(self.path) == resume_id:
+                shutil.copyfile(self.path, self.part_path)
+                mode = 'a'
+            else:
+                logging.info(f"{self.path} is not the archive of the resumed run; starting a new one")
+        self.archive_id = resume_id if mode == 'a' else uuid.uuid4().hex
+        self._zip = zipfile.ZipFile(
+            self.part_path, mode, compression=method,
+            compresslevel=level if method == zipfile.ZIP_DEFLATED else None,
+        )
+        self._zip.comment = self.archive_id.encode('ascii')
+        self.names = set(self._zip.namelist())
+        self.added = 0
+        self._lock = threading.Lock()
+        if self.names:
+            logging.info(f"Appending to {self.path}: {len(self.names)} entries already archived")
+
+    def __contains__(self, name):
+        return name in self.names
+
+    @contextmanager
+    def open(self, name):
+        """A writable binary stream for entry `name`. Other writers wait until it is closed."""
+        with self._lock:
+            if name in self.names:
+                raise ValueError(f"{self.path} already has an entry {name}")
+            with self._zip.open(name, 'w', force_zip64=True) as entry:
+                yield entry
+            self.names.add(name)
+            self.added += 1
+
+    def write_stream(self, name, source):
+        """Copies a readable binary stream into entry `name`."""
+        with self.open(name) as entry:
+            shutil.copyfileobj(source, entry)
+
+    def write_workbook(self, name, headers, rows):
+        """Writes rows as an Excel workbook straight into entry `name`."""
+        sink = ExcelSink(name, headers)
+        for row in rows:
+            sink.write(row)
+        with self.open(name) as entry:
+            sink.close(entry)
+
+    def write_file(self, name, file_path):
+        """Copies an existing file (e.g. a browser download) into entry `name`."""
+        with open(file_path, 'rb') as source:
+            self.write_stream(name, source)
+
+    def finish(self):
+        """Closes the archive and moves it into place; returns False (and leaves nothing) if it is empty."""
+        with self._lock:
+            self._zip.close()
+            if not self.names:
+                os.remove(self.part_path)
+                return False
+            os.replace(self.part_path, self.path)
+        logging.info(f"Wrote {self.path}: {self.added} new entries, {len(self.names)} in total")
+        return True
+
+    def abort(self):
+        """Closes and discards the unfinished archive; an earlier finished one is left untouched."""
+        with self._lock:
+            self._zip.close()
+            if self.part_path.exists():
+                os.remove(self.part_path)
+
+
+def zip_settings(data):
+    """(compression, level) from a task's 'zip_compression' and 'zip_level', or the EPFO_ZIP_* defaults."""
+    return data.get('zip_compression', ZIP_COMPRESSION), int(data.get('zip_level', ZIP_LEVEL))
+
+
+def archive_id(path):
+    """The id in a finished archive's zip comment, or None for an unreadable or foreign zip."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return zf.comment.decode('ascii') or None
+    except (OSError, zipfile.BadZipFile, UnicodeDecodeError):
+        return None
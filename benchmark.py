@@ -0,0 +1,331 @@
+"""
+End-to-end benchmarks of the three extraction tasks against mock_portal.py.
+
+Each scenario (task x dataset size x latency profile) runs in its own
+process with a fresh headless browser, calling run_uan_extraction,
+run_ecr_extraction or run_msd_extraction exactly as the GUI does. The
+following are collected per scenario:
+
+- throughput: UAN lookups/min, ECR pages/min, MSD UANs/min and rows/s
+- p50/p95/max per-item latency: one UAN lookup, one ECR page (load plus
+  downloads), one MSD UAN (every grid page)
+- peak RSS of the Python process and of its largest browser child
+- output-write time: time spent in sink writes and closes
+- finalize time: from the end of the item loop to the task's return
+  (zipping, workbook save)
+
+Results are written to a JSON file. Passing an earlier file as --baseline
+flags every scenario whose throughput dropped, or whose p95 grew, by more
+than --threshold, and exits with status 1.
+
+    python benchmark.py --sizes small,medium --latency lan,typical --output bench.json
+    python benchmark.py --output bench_new.json --baseline bench.json --threshold 0.15
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from metrics import percentile
+
+TASKS = ('uan', 'ecr', 'msd')
+# Portal size and the number of items each task works through
+SIZES = {
+    'small': {'members': 500, 'ecr_statements': 30, 'uans': 20, 'msd_uans': 5},
+    'medium': {'members': 5000, 'ecr_statements': 120, 'uans': 100, 'msd_uans': 20},
+    'large': {'members': 20000, 'ecr_statements': 360, 'uans': 500, 'msd_uans': 100},
+}
+# (latency_ms, jitter_ms) added by the mock portal to every JSON/PDF response
+LATENCY_PROFILES = {'lan': (20, 10), 'typical': (150, 75), 'slow': (600, 300)}
+DEFAULT_THRESHOLD = 0.10
+
+
+def _peak_rss_mb():
+    """(this process, largest finished child) peak RSS in MB, or (None, None) where unsupported."""
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+# --- Scenario process side ---
+class _TimedSink:
+    """Wraps an output sink and adds the time spent writing and closing it to `timings['write_s']`."""
+
+    def __init__(self, sink, timings):
+        self._sink = sink
+        self._timings = timings
+
+    def __getattr__(self, name):
+        return getattr(self._sink, name)
+
+    def write(self, row):
+        started = time.perf_counter()
+        self._sink.write(row)
+        self._timings['write_s'] += time.perf_counter() - started
+
+    def close(self, *args):
+        started = time.perf_counter()
+        self._sink.close(*args)
+        self._timings['write_s'] += time.perf_counter() - started
+
+
+def run_scenario(spec):
+    """Runs one task against the portal at spec['url'] and returns its measurements."""
+    from playwright.sync_api import sync_playwright
+    import engine
+
+    task = spec['task']
+    timings = {'write_s': 0.0, 'loop_end': None}
+    samples = []
+    rows_total = [0]
+    page_starts = []
+
+    def timed(func, on_result=None):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            samples.append((time.perf_counter() - started) * 1000)
+            if on_result:
+                on_result(result)
+            return result
+        return wrapper
+
+    # The engine looks these names up in its own module, so wrapping them there times every call
+    if task == 'uan':
+        engine.lookup_uan = timed(engine.lookup_uan)
+    elif task == 'msd':
+        engine.scrape_service_details = timed(
+            engine.scrape_service_details, lambda result: rows_total.__setitem__(0, rows_total[0] + len(result[1]))
+        )
+    else:
+        original_wait = engine.wait_for_ecr_page
+        def wait_for_ecr_page(*args, **kwargs):
+            page_starts.append(time.perf_counter())
+            return original_wait(*args, **kwargs)
+        engine.wait_for_ecr_page = wait_for_ecr_page
+
+    original_open_sink = engine.open_sink
+    engine.open_sink = lambda *args, **kwargs: _TimedSink(original_open_sink(*args, **kwargs), timings)
+
+    # UAN and MSD close their journal right after the item loop, ECR then builds its zip; what follows is finalizing
+    def mark_loop_end():
+        if timings['loop_end'] is None:
+            timings['loop_end'] = time.perf_counter()
+
+    class TimedJournal(engine.Journal):
+        def close(self):
+            mark_loop_end()
+            super().close()
+    engine.Journal = TimedJournal
+
+    class TimedStore(engine.EcrStore):
+        def build_archive(self, *args, **kwargs):
+            mark_loop_end()
+            return super().build_archive(*args, **kwargs)
+    engine.EcrStore = TimedStore
+
+    errors = []
+    def drain():
+        while True:
+            result_type, data = engine.result_queue.get()
+            if result_type == 'stop':
+                return
+            if result_type == 'error':
+                errors.append(str(data))
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+
+    if task == 'uan':
+        command = engine.run_uan_extraction, {
+            'uans': spec['uans'], 'output_file': spec.get('output_file', 'bench_uan.xlsx'),
+            'strategy': 'search', 'use_cache': False,
+        }
+    elif task == 'ecr':
+        command = engine.run_ecr_extraction, {
+            'start_date': datetime.fromisoformat(spec['start_date']), 'end_date': datetime.fromisoformat(spec['end_date']),
+        }
+    else:
+        command = engine.run_msd_extraction, {'uans': spec['uans']}
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            page = browser.new_page()
+            page.goto(spec['url'], timeout=60000, wait_until="domcontentloaded")
+            started = time.perf_counter()
+            command[0](page, command[1])
+            finished = time.perf_counter()
+        finally:
+            browser.close()
+    engine.result_queue.put(('stop', None))
+    drainer.join()
+
+    if task == 'ecr':
+        # A page lasts until the next one starts loading; the last one until the loop ends
+        boundaries = page_starts + [timings['loop_end'] or finished]
+        samples = [(b - a) * 1000 for a, b in zip(boundaries, boundaries[1:])]
+        items = len(page_starts)
+    else:
+        items = len(spec['uans'])
+
+    elapsed = finished - started
+    peak_rss, peak_child_rss = _peak_rss_mb()
+    result = {
+        'items': items,
+        'elapsed_s': round(elapsed, 3),
+        'items_per_min': round(items * 60 / elapsed, 2) if elapsed else None,
+        'p50_ms': percentile(samples, 0.50),
+        'p95_ms': percentile(samples, 0.95),
+        'max_ms': max(samples) if samples else None,
+        'write_s': round(timings['write_s'], 4),
+        'finalize_s': round(finished - timings['loop_end'], 4) if timings['loop_end'] else None,
+        'peak_rss_mb': peak_rss and round(peak_rss, 1),
+        'peak_child_rss_mb': peak_child_rss and round(peak_child_rss, 1),
+        'errors': errors,
+    }
+    if task == 'msd':
+        result['rows'] = rows_total[0]
+        result['rows_per_s'] = round(rows_total[0] / elapsed, 2) if elapsed else None
+    for key in ('p50_ms', 'p95_ms', 'max_ms'):
+        if result[key] is not None:
+            result[key] = round(result[key], 1)
+    return result
+
+
+# --- Coordinator side ---
+def _scenario_spec(task, size, portal):
+    data = portal.data
+    spec = {'task': task, 'url': portal.url}
+    if task == 'uan':
+        count = SIZES[size]['uans']
+        # Spread over the whole table, plus one UAN the portal does not know
+        step = max(1, len(data.members) // count)
+        spec['uans'] = [m[0] for m in data.members[::step][:count - 1]] + ["999999999999"]
+    elif task == 'msd':
+        count = SIZES[size]['msd_uans']
+        step = max(1, len(data.members) // count)
+        spec['uans'] = [m[0] for m in data.members[::step][:count]]
+    else:
+        months = [datetime.strptime(s['wage_month'], "%b-%Y") for s in data.statements]
+        spec['start_date'], spec['end_date'] = min(months).isoformat(), max(months).isoformat()
+    return spec
+
+
+def run_benchmarks(tasks, sizes, latencies):
+    from mock_portal import MockPortal
+
+    scenarios = []
+    for size in sizes:
+        for latency in latencies:
+            latency_ms, jitter_ms = LATENCY_PROFILES[latency]
+            portal_options = {k: v for k, v in SIZES[size].items() if k in ('members', 'ecr_statements')}
+            with MockPortal(latency_ms=latency_ms, jitter_ms=jitter_ms, open_session=True, **portal_options) as portal:
+                for task in tasks:
+                    name = f"{task}/{size}/{latency}"
+                    print(f"Running {name}...", flush=True)
+                    with tempfile.TemporaryDirectory() as work_dir:
+                        completed = subprocess.run(
+                            [sys.executable, str(Path(__file__).resolve()), '--scenario'],
+                            input=json.dumps(_scenario_spec(task, size, portal)),
+                            capture_output=True, text=True, cwd=work_dir,
+                        )
+                    entry = {'task': task, 'size': size, 'latency': latency}
+                    output = completed.stdout.strip().splitlines()
+                    entry.update(json.loads(output[-1]) if output else {'failed': completed.stderr.strip().splitlines()[-1:] or ["no output"]})
+                    if 'failed' in entry:
+                        print(f"  failed: {entry['failed'][0]}", flush=True)
+                    else:
+                        print(f"  {entry['items_per_min']} items/min, p50 {entry['p50_ms']} ms, p95 {entry['p95_ms']} ms", flush=True)
+                    scenarios.append(entry)
+    return scenarios
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Returns a description of every scenario that regressed by more than `threshold` (a fraction)."""
+    previous = {(s['task'], s['size'], s['latency']): s for s in baseline['scenarios'] if 'failed' not in s}
+    regressions = []
+    for scenario in current['scenarios']:
+        key = (scenario['task'], scenario['size'], scenario['latency'])
+        old = previous.get(key)
+        if not old:
+            continue
+        name = "/".join(key)
+        if 'failed' in scenario:
+            regressions.append(f"{name}: failed ({scenario['failed'][0]})")
+            continue
+        if old.get('items_per_min') and scenario['items_per_min'] < old['items_per_min'] * (1 - threshold):
+            regressions.append(f"{name}: throughput {old['items_per_min']} -> {scenario['items_per_min']} items/min")
+        if old.get('p95_ms') and scenario['p95_ms'] and scenario['p95_ms'] > old['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {old['p95_ms']} -> {scenario['p95_ms']} ms")
+    return regressions
+
+
+def _choices(value, allowed):
+    items = [v.strip() for v in value.split(',') if v.strip()]
+    unknown = [v for v in items if v not in allowed]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return items
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the extraction tasks against the mock portal.")
+    parser.add_argument('--tasks', type=lambda v: _choices(v, TASKS), default=list(TASKS))
+    parser.add_argument('--sizes', type=lambda v: _choices(v, SIZES), default=['small'])
+    parser.add_argument('--latency', type=lambda v: _choices(v, LATENCY_PROFILES), default=['lan', 'typical'])
+    parser.add_argument('--output', default="benchmark_results.json")
+    parser.add_argument('--baseline', help="earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed fractional drop in throughput / growth in p95 (default 0.10)")
+    parser.add_argument('--scenario', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario:
+        logging.basicConfig(filename='epfo_scraper.log', level=logging.INFO,
+                            format='%(asctime)s - %(levelname)s - %(message)s')
+        try:
+            print(json.dumps(run_scenario(json.load(sys.stdin))))
+        except Exception as e:
+            logging.exception("Benchmark scenario failed")
+            print(json.dumps({'failed': [f"{type(e).__name__}: {(str(e).splitlines() or [''])[0]}"]}))
+        return 0
+
+    results = {
+        'commit': _git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'scenarios': run_benchmarks(args.tasks, args.sizes, args.latency),
+    }
+    Path(args.output).write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text(encoding='utf-8')), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
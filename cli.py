@@ -0,0 +1,164 @@
+"""
+Headless command-line front end for the extraction engine.
+
+Runs one UAN, ECR or MSD job without the Tk GUI, reusing the login session
+saved by the GUI's "Verify Login Status" (or EPFO_SESSION_FILE). Every
+message from the engine is written to stdout as one JSON object per line:
+
+    {"time": "2024-05-01T10:00:00", "type": "status_update", "data": "Extracting data for UAN: ..."}
+
+Exit codes: 0 success, 1 the job reported errors, 2 no valid saved session
+or the browser could not start.
+
+Examples:
+    python cli.py uan --uans-file uans.txt --output epfo_data.csv --pool-size 4
+    python cli.py ecr --start 2024-01 --end 2024-12 --table-output ecr_figures.xlsx
+    python cli.py msd --uans-file uans.txt --shards 4 --combined-output service_details.csv
+"""
+import argparse
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from archive import COMPRESSION_METHODS, ZIP_COMPRESSION, ZIP_LEVEL
+from portal import MAX_POOL_SIZE, MAX_SHARD_COUNT, UAN_STRATEGIES
+from sinks import SINK_SUFFIXES, TABLE_SUFFIXES
+
+
+def read_uans(path):
+    """Reads UANs from a file, one per line or separated by commas/whitespace."""
+    return [u for u in re.split(r"[\s,]+", Path(path).read_text(encoding='utf-8')) if u]
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a month in YYYY-MM form")
+
+
+def bounded_int(low, high):
+    def parse(value):
+        number = int(value)
+        if not low <= number <= high:
+            raise argparse.ArgumentTypeError(f"must be between {low} and {high}")
+        return number
+    return parse
+
+
+def add_zip_options(parser):
+    parser.add_argument('--zip-compression', choices=list(COMPRESSION_METHODS), default=ZIP_COMPRESSION)
+    parser.add_argument('--zip-level', type=bounded_int(0, 9), default=ZIP_LEVEL, help="deflate level")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run EPFO extraction jobs without the GUI.")
+    sub = parser.add_subparsers(dest='job', required=True)
+
+    uan = sub.add_parser('uan', help="UAN Profile Extractor")
+    uan.add_argument('--uans-file', required=True, help="file with the UANs to look up")
+    uan.add_argument('--output', required=True, help=f"output file ({', '.join(SINK_SUFFIXES)})")
+    uan.add_argument('--pool-size', type=bounded_int(1, MAX_POOL_SIZE), default=1, help="parallel browsers")
+    uan.add_argument('--shards', type=bounded_int(1, MAX_SHARD_COUNT), default=1, help="worker processes")
+    uan.add_argument('--strategy', choices=UAN_STRATEGIES, default=UAN_STRATEGIES[0])
+    uan.add_argument('--resume', action='store_true', help="continue a previous interrupted run")
+    uan.add_argument('--no-cache', action='store_true', help="look every UAN up on the portal")
+
+    ecr = sub.add_parser('ecr', help="Download ECR Statement PDFs")
+    ecr.add_argument('--start', type=parse_month, required=True, help="first wage month, YYYY-MM")
+    ecr.add_argument('--end', type=parse_month, required=True, help="last wage month, YYYY-MM")
+    ecr.add_argument('--table-output', help=f"also extract the statements' figures into one table ({', '.join(TABLE_SUFFIXES)})")
+    add_zip_options(ecr)
+
+    msd = sub.add_parser('msd', help="Member Service Details Extractor")
+    msd.add_argument('--uans-file', required=True)
+    msd.add_argument('--shards', type=bounded_int(1, MAX_SHARD_COUNT), default=1, help="worker processes")
+    msd.add_argument('--combined-output', help="stream every UAN into one .csv or .jsonl file instead of a zip of workbooks")
+    msd.add_argument('--resume', action='store_true')
+    add_zip_options(msd)
+    return parser
+
+
+def build_command(args, parser):
+    """Turns parsed arguments into the (command, data) tuple the engine's worker expects."""
+    if args.job == 'uan':
+        if Path(args.output).suffix.lower() not in SINK_SUFFIXES:
+            parser.error(f"--output must end in one of: {', '.join(SINK_SUFFIXES)}")
+        return ('run_uan', {
+            'uans': read_uans(args.uans_file), 'output_file': args.output, 'pool_size': args.pool_size,
+            'shards': args.shards, 'strategy': args.strategy, 'resume': args.resume, 'use_cache': not args.no_cache,
+        })
+    if args.job == 'ecr':
+        if args.start > args.end:
+            parser.error("--start must not be after --end")
+        if args.table_output and Path(args.table_output).suffix.lower() not in TABLE_SUFFIXES:
+            parser.error(f"--table-output must end in one of: {', '.join(TABLE_SUFFIXES)}")
+        return ('run_ecr', {
+            'start_date': args.start, 'end_date': args.end, 'table_output': args.table_output,
+            'zip_compression': args.zip_compression, 'zip_level': args.zip_level,
+        })
+    if args.combined_output and Path(args.combined_output).suffix.lower() not in ('.csv', '.jsonl'):
+        parser.error("--combined-output must be a .csv or .jsonl file")
+    return ('run_msd', {
+        'uans': read_uans(args.uans_file), 'shards': args.shards, 'resume': args.resume,
+        'combined_output': args.combined_output,
+        'zip_compression': args.zip_compression, 'zip_level': args.zip_level,
+    })
+
+
+def emit(result_type, data):
+    line = {'time': datetime.now().isoformat(timespec='seconds'), 'type': result_type, 'data': data}
+    sys.stdout.write(json.dumps(line, default=str) + "\n")
+    sys.stdout.flush()
+
+
+def run(command):
+    """Runs one job on a headless worker and returns the process exit code."""
+    # Imported here so argument errors are reported without loading Playwright
+    from engine import playwright_worker
+    from worker_queues import command_queue, result_queue
+
+    worker = threading.Thread(target=playwright_worker, args=(True,), daemon=True)
+    worker.start()
+    exit_code = 0
+    job_sent = False
+    while worker.is_alive() or not result_queue.empty():
+        try:
+            result_type, data = result_queue.get(timeout=0.2)
+        except queue.Empty:
+            continue
+        emit(result_type, data)
+        if result_type == 'session_restored' and not job_sent:
+            command_queue.put(command)
+            command_queue.put(('shutdown', None))
+            job_sent = True
+        elif result_type == 'login_required':
+            emit('error', "No valid saved session. Log in once with the GUI (python main.py) and try again.")
+            command_queue.put(('shutdown', None))
+            exit_code = 2
+        elif result_type == 'error':
+            exit_code = exit_code or (1 if job_sent else 2)
+    return exit_code
+
+
+def main(argv=None):
+    logging.basicConfig(filename='epfo_scraper.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        command = build_command(args, parser)
+    except OSError as e:
+        parser.error(f"Could not read the UAN file: {e}")
+    if command[0] in ('run_uan', 'run_msd') and not command[1]['uans']:
+        parser.error("The UAN file is empty")
+    return run(command)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Parallel ECR statement downloads over plain HTTP.
+
+Clicking each "View" link and waiting for the browser's download is serial
+by nature. Instead, run_ecr_extraction reads every row's PDF link URL and
+hands it to a small thread pool, which fetches it with the browser
+context's session cookies and user agent. Each PDF is streamed in chunks
+into a spooled temporary file (in memory unless it is unusually large),
+from which the caller copies it into the ECR store.
+
+Playwright's sync API may only be used from the thread that created it, so
+context.request cannot be driven from the pool; copying the session headers
+gives the same authenticated request without the browser in the loop.
+EPFO_ECR_DOWNLOADS=click keeps the old one-by-one browser downloads.
+"""
+import logging
+import os
+import tempfile
+import urllib.request
+
+ECR_DOWNLOAD_MODE = os.environ.get("EPFO_ECR_DOWNLOADS", "parallel").lower()
+DOWNLOAD_CONCURRENCY = int(os.environ.get("EPFO_DOWNLOAD_CONCURRENCY", 4))
+DOWNLOAD_TIMEOUT_S = 120
+CHUNK_SIZE = 64 * 1024
+# Statements larger than this spill from memory to a temporary file
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def session_headers(page, url):
+    """Cookie, User-Agent and Referer headers that make a request to `url` look like the browser's own."""
+    cookies = page.context.cookies(url)
+    headers = {
+        'User-Agent': page.evaluate("navigator.userAgent"),
+        'Referer': page.url,
+        'Accept': 'application/pdf,*/*',
+    }
+    if cookies:
+        headers['Cookie'] = "; ".join(f"{c['name']}={c['value']}" for c in cookies)
+    return headers
+
+
+def fetch_pdf(url, headers, timeout=DOWNLOAD_TIMEOUT_S):
+    """Streams `url` into a spooled temporary file and returns it rewound. Raises OSError or ValueError."""
+    spool = tempfile.SpooledTemporaryFile(SPOOL_MAX_BYTES)
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+            chunk = response.read(CHUNK_SIZE)
+            # An expired session gets the login page back instead of a statement
+            if not chunk.startswith(b"%PDF"):
+                raise ValueError(f"{url} did not return a PDF (has the login session expired?)")
+            while chunk:
+                spool.write(chunk)
+                chunk = response.read(CHUNK_SIZE)
+    except BaseException:
+        spool.close()
+        raise
+    logging.info(f"Downloaded {url} ({spool.tell()} bytes)")
+    spool.seek(0)
+    return spool
@@ -0,0 +1,236 @@
+"""
+Key figures from downloaded ECR statement PDFs, as one table.
+
+Each statement's text is searched for its TRRN, wage month, ECR type,
+member count, EPF / EPS / EDLI contributions, administrative charges and
+total amount. The results go into a single CSV, Excel, JSON Lines or Parquet
+file, one row per statement, with a note where the parts do not add up to
+the total. Files that cannot be parsed are listed with the reason in
+"<output>.failures.csv".
+
+Parsing runs in a process pool with one process per core. Like sharding.py
+it is started as its own `python ecr_parse.py` process, so the pool's
+children never re-import main.py (which builds the Tk window at import):
+
+    python ecr_parse.py --start 2024-01 --end 2024-12 --output ecr_figures.xlsx
+    python ecr_parse.py --output figures.csv statement1.pdf statement2.pdf
+
+Text is extracted with pypdf, which decodes the embedded, subset fonts the
+portal's statements are typeset with.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import io
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+
+from sinks import TABLE_SUFFIXES, open_sink
+
+STATEMENT_COLUMNS = [
+    "File", "TRRN", "Wage Month", "ECR Type", "Members",
+    "EPF", "EPS", "EDLI", "Admin Charges", "Total Amount", "Notes",
+]
+
+_AMOUNT = r"(?:Rs\.?\s*)?([\d,]+(?:\.\d{1,2})?)"
+# Each label starts a line; anything up to the colon (e.g. "(A/c 1)", "(Rs.)") is skipped
+FIELD_PATTERNS = {
+    "TRRN": r"^\s*TRRN(?:\s*No\.?)?[^:\n]*:\s*(\d{10,})",
+    "Wage Month": r"^\s*Wage\s+Month[^:\n]*:\s*([A-Za-z]{3,9}[-\s/]\d{4})",
+    "ECR Type": r"^\s*ECR\s+Type[^:\n]*:\s*([A-Za-z]+)",
+    "Members": r"^\s*(?:Total\s+Members|No\.?\s+of\s+Members|Total\s+Subscribers)[^:\n]*:\s*([\d,]+)",
+    "EPF": r"^\s*EPF\b[^:\n]*:\s*" + _AMOUNT,
+    "EPS": r"^\s*EPS\b[^:\n]*:\s*" + _AMOUNT,
+    "EDLI": r"^\s*EDLI\b[^:\n]*:\s*" + _AMOUNT,
+    "Admin Charges": r"^\s*Admin(?:istrative|istration)?\s+Charges[^:\n]*:\s*" + _AMOUNT,
+    "Total Amount": r"^\s*Total\s+Amount[^:\n]*:\s*" + _AMOUNT,
+}
+REQUIRED_FIELDS = ("TRRN", "Wage Month", "Total Amount")
+AMOUNT_FIELDS = ("EPF", "EPS", "EDLI", "Admin Charges", "Total Amount")
+
+
+class StatementParseError(Exception):
+    """A statement PDF whose figures could not be read; the message says why."""
+
+
+# --- Text extraction ---
+def pdf_text(data):
+    """The text of a PDF, one line per text line where the layout allows."""
+    if not data.startswith(b"%PDF"):
+        raise StatementParseError("not a PDF file")
+    try:
+        return "\n".join(page.extract_text() or "" for page in PdfReader(io.BytesIO(data)).pages)
+    except (PyPdfError, ValueError, KeyError) as e:
+        raise StatementParseError(f"unreadable PDF: {e}")
+
+
+# --- Field parsing ---
+def _number(text):
+    value = float(text.replace(",", ""))
+    return int(value) if value.is_integer() else value
+
+
+def parse_statement_text(text):
+    """{column: value} for the figures found in a statement's text. Raises StatementParseError."""
+    if not text.strip():
+        raise StatementParseError("no text found (scanned image?)")
+    record = {}
+    for field, pattern in FIELD_PATTERNS.items():
+        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        record[field] = match.group(1).strip() if match else ""
+    missing = [field for field in REQUIRED_FIELDS if not record[field]]
+    if missing:
+        raise StatementParseError(f"missing {', '.join(missing)}")
+    for field in AMOUNT_FIELDS + ("Members",):
+        if record[field]:
+            record[field] = _number(record[field])
+    record["Wage Month"] = re.sub(r"[\s/]", "-", record["Wage Month"]).title()
+
+    parts = [record[field] for field in ("EPF", "EPS", "EDLI", "Admin Charges") if record[field] != ""]
+    notes = []
+    if parts and abs(sum(parts) - record["Total Amount"]) > 1:
+        notes.append(f"parts add up to {sum(parts):,} instead of {record['Total Amount']:,}")
+    record["Notes"] = "; ".join(notes)
+    return record
+
+
+def parse_statement(path):
+    """Reads one statement PDF and returns its row. Raises StatementParseError or OSError."""
+    record = parse_statement_text(pdf_text(Path(path).read_bytes()))
+    record["File"] = Path(path).name
+    return record
+
+
+def _parse_in_worker(path):
+    """Process pool entry point: (path, row, None) or (path, None, reason); never raises."""
+    try:
+        return path, parse_statement(path), None
+    except StatementParseError as e:
+        return path, None, str(e)
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def parse_statements(paths, workers=None):
+    """Parses PDFs on every core. Returns (rows sorted by wage month and TRRN, [(path, reason)])."""
+    paths = [str(p) for p in paths]
+    if not paths:
+        return [], []
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_parse_in_worker, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    rows = [row for _, row, _ in results if row]
+    failures = [(path, reason) for path, _, reason in results if reason]
+    rows.sort(key=lambda row: (_month_key(row["Wage Month"]), row["TRRN"]))
+    return rows, failures
+
+
+def _month_key(wage_month):
+    for fmt in ("%b-%Y", "%B-%Y"):
+        try:
+            return datetime.strptime(wage_month, fmt)
+        except ValueError:
+            pass
+    return datetime.max
+
+
+# --- Output ---
+def write_table(rows, output_path):
+    """Writes the statement rows as .csv, .xlsx, .jsonl or .parquet."""
+    output_path = Path(output_path)
+    if output_path.suffix.lower() == '.parquet':
+        import pandas as pd
+
+        try:
+            pd.DataFrame(rows, columns=STATEMENT_COLUMNS).to_parquet(output_path, index=False)
+        except ImportError:
+            raise ValueError("Parquet output needs pyarrow (pip install pyarrow)")
+        return
+    sink = open_sink(output_path, STATEMENT_COLUMNS)
+    try:
+        for row in rows:
+            sink.write(row)
+    finally:
+        sink.close()
+
+
+def failures_path(output_path):
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.failures.csv")
+
+
+def write_failures(failures, output_path):
+    """Lists the files that could not be parsed, and why, next to the table; returns the path or None."""
+    path = failures_path(output_path)
+    if not failures:
+        if path.exists():
+            os.remove(path)
+        return None
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(["File", "Reason"])
+        writer.writerows((Path(p).name, reason) for p, reason in failures)
+    return path
+
+
+# --- Command line ---
+def _parse_month(value):
+    try:
+        return datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a month in YYYY-MM form")
+
+
+def main(argv=None):
+    logging.basicConfig(filename='epfo_scraper.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Extract the key figures of ECR statement PDFs into one table.")
+    parser.add_argument('files', nargs='*', help="statement PDFs; by default the ECR store's statements for --start..--end")
+    parser.add_argument('--output', required=True, help=f"table file ({', '.join(TABLE_SUFFIXES)})")
+    parser.add_argument('--start', type=_parse_month, help="first wage month, YYYY-MM")
+    parser.add_argument('--end', type=_parse_month, help="last wage month, YYYY-MM")
+    parser.add_argument('--store', help="ECR store directory (default: EPFO_ECR_STORE or ecr_store)")
+    parser.add_argument('--workers', type=int, help="parser processes (default: one per core)")
+    args = parser.parse_args(argv)
+    if Path(args.output).suffix.lower() not in TABLE_SUFFIXES:
+        parser.error(f"--output must end in one of: {', '.join(TABLE_SUFFIXES)}")
+
+    paths = args.files
+    if not paths:
+        if not (args.start and args.end):
+            parser.error("give statement files, or --start and --end to read them from the ECR store")
+        from ecr_store import ECR_STORE_DIR, EcrStore
+
+        store = EcrStore(args.store or ECR_STORE_DIR)
+        paths = [path for _, _, _, path in store.between(args.start, args.end)]
+        store.close()
+
+    rows, failures = parse_statements(paths, args.workers)
+    try:
+        write_table(rows, args.output)
+    except (ValueError, OSError) as e:
+        print(json.dumps({'error': f"Could not write {args.output}: {e}"}))
+        return 1
+    failures_file = write_failures(failures, args.output)
+    for path, reason in failures:
+        logging.warning(f"Could not parse ECR statement {path}: {reason}")
+    logging.info(f"Parsed {len(rows)} of {len(paths)} ECR statements into {args.output}")
+    # The last line is a machine-readable summary for run_ecr_extraction
+    print(json.dumps({
+        'parsed': len(rows), 'failed': len(failures), 'output': args.output,
+        'failures_file': str(failures_file) if failures_file else None,
+        'failures': [[Path(p).name, reason] for p, reason in failures[:20]],
+    }))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
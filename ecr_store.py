@@ -0,0 +1,122 @@
+"""
+Local store of downloaded ECR statements.
+
+Statements for past wage months never change, so every PDF is downloaded
+once into ECR_STORE_DIR and recorded in a SQLite manifest (TRRN, wage month,
+SHA-256, path, size). run_ecr_extraction skips TRRNs the store already holds,
+so a routine monthly run only downloads the new statements, and the zip for
+any date range is assembled from the store rather than from the portal.
+
+A file that has gone missing or no longer matches its hash is dropped from
+the manifest and downloaded again by the next run.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from archive import ArchiveWriter
+
+ECR_STORE_DIR = Path(os.environ.get("EPFO_ECR_STORE", "ecr_store"))
+CHUNK_SIZE = 64 * 1024
+
+
+class EcrStore:
+    def __init__(self, directory=ECR_STORE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Download pool threads store statements too, hence the shared connection + lock
+        self._conn = sqlite3.connect(self.directory / "manifest.sqlite3", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS statements ("
+            " trrn TEXT PRIMARY KEY, wage_month TEXT NOT NULL, wage_date TEXT NOT NULL,"
+            " sha256 TEXT NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, downloaded_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._paths = dict(self._conn.execute("SELECT trrn, path FROM statements"))
+        logging.info(f"ECR store {self.directory}: {len(self._paths)} statements on record")
+
+    def __contains__(self, trrn):
+        """True if the statement is on record and its file is still there."""
+        path = self._paths.get(trrn)
+        return bool(path) and os.path.exists(path)
+
+    def put_stream(self, trrn, wage_month, wage_date, source):
+        """Stores a statement read from a binary stream, hashing it on the way, and records it."""
+        path = self.directory / f"{trrn}_{wage_month}.pdf"
+        part_path = path.with_name(path.name + ".part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(part_path, path)
+        except BaseException:
+            if part_path.exists():
+                os.remove(part_path)
+            raise
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO statements (trrn, wage_month, wage_date, sha256, path, size, downloaded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (trrn, wage_month, wage_date.strftime('%Y-%m'), digest.hexdigest(), str(path), size, time.time()),
+            )
+            self._conn.commit()
+            self._paths[trrn] = str(path)
+        return path
+
+    def put_file(self, trrn, wage_month, wage_date, file_path):
+        """Stores a copy of an existing file, e.g. a finished browser download."""
+        with open(file_path, 'rb') as source:
+            return self.put_stream(trrn, wage_month, wage_date, source)
+
+    def forget(self, trrn):
+        with self._lock:
+            self._conn.execute("DELETE FROM statements WHERE trrn = ?", (trrn,))
+            self._conn.commit()
+            self._paths.pop(trrn, None)
+
+    def between(self, start_date, end_date):
+        """[(trrn, wage_month, sha256, path)] of the stored statements in the date range, oldest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT trrn, wage_month, sha256, path FROM statements"
+                " WHERE wage_date BETWEEN ? AND ? ORDER BY wage_date, trrn",
+                (start_date.strftime('%Y-%m'), end_date.strftime('%Y-%m')),
+            ).fetchall()
+
+    def build_archive(self, zip_path, start_date, end_date, compression, level):
+        """
+        Writes every stored statement of the date range into a new zip and
+        returns how many it holds. Statements whose file is missing or
+        corrupted are left out and forgotten, so the next run fetches them again.
+        """
+        archive = ArchiveWriter(zip_path, compression, level)
+        for trrn, wage_month, sha256, path in self.between(start_date, end_date):
+            if not os.path.exists(path) or _sha256(path) != sha256:
+                logging.warning(f"ECR store: {path} for TRRN {trrn} is missing or damaged; it will be downloaded again")
+                self.forget(trrn)
+                continue
+            archive.write_file(Path(path).name, path)
+        count = len(archive.names)
+        archive.finish()
+        return count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,802 @@
+"""
+Extraction engine shared by the Tk GUI (main.py) and the headless CLI (cli.py).
+
+A single long-running worker thread owns the Playwright browser and executes
+commands taken from `command_queue` ('open_login_page', 'verify_login',
+'run_uan', 'run_ecr', 'run_msd', 'shutdown'). Everything it has to report goes
+onto `result_queue` as (type, data) tuples: 'status_update', 'error', 'info',
+'browser_opened', 'login_verified', 'login_required' and 'session_restored'. Front ends only
+talk to the engine through these two queues.
+"""
+import json
+import logging
+import sqlite3
+import subprocess
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from zipfile import BadZipFile
+from datetime import datetime
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
+from portal import (
+    UAN_COLUMNS, DOWNLOAD_START_TIMEOUT_MS, PAGE_LOAD_TIMEOUT_MS, goto_portal, probe_login, wait_for_navigation, MAX_POOL_SIZE, MAX_SHARD_COUNT, LEGACY_UAN_SEARCH_SLEEP_MS, get_month_index, split_into_slices,
+    choose_uan_strategy, harvest_member_list,
+    open_member_profile, lookup_uan, read_table, ecr_pdf_links, ecr_pager, ecr_wage_month_sort, jump_to_ecr_page, first_ecr_trrn, wait_for_ecr_page, open_member_service_details, scrape_service_details,
+)
+import sharding
+from archive import ArchiveWriter, zip_settings
+from ecr_store import EcrStore
+from downloads import ECR_DOWNLOAD_MODE, DOWNLOAD_CONCURRENCY, session_headers, fetch_pdf
+from journal import Journal
+from latency import TRACKER
+from metrics import RunMetrics
+from retry import RETRY_ATTEMPTS, CircuitBreaker, CircuitOpenError, RetryQueue, with_retries
+from sinks import open_sink, close_sink, OrderedWriter
+from routing import ResourceBlocker
+from session import saved_session, save_session, forget_session
+from uan_cache import UanCache
+from worker_queues import command_queue, result_queue
+from xhr_capture import EXTRACTION_BACKEND, ResponseCapture, member_records_from_payloads
+
+# --- This is the dedicated thread for ALL Playwright operations ---
+def playwright_worker(headless=False):
+    """
+    This function runs in a separate, long-running thread.
+    It initializes Playwright and waits for commands from the command_queue.
+    `headless` is for unattended runs, which depend on a saved session.
+    """
+    playwright_context = {}
+    blocker = ResourceBlocker()
+
+    def new_page(storage_state=None):
+        context = browser.new_context(storage_state=storage_state)
+        blocker.attach(context)
+        return context.new_page()
+
+    with sync_playwright() as p:
+        try:
+            browser = p.chromium.launch(headless=headless)
+            playwright_context['browser'] = browser
+            page = None
+            logged_in = False
+            # --- Try the session saved by the last verified login before asking for a new one ---
+            if saved_session():
+                result_queue.put(('status_update', "Checking saved login session..."))
+                page = new_page(saved_session())
+                try:
+                    goto_portal(page)
+                    logged_in = probe_login(page)
+                except PlaywrightError as e:
+                    logging.warning(f"Could not open the portal with the saved session: {e}")
+                if not logged_in:
+                    logging.info("Saved login session is no longer valid")
+                    page.context.close()
+                    forget_session()
+                    page = None
+            if logged_in:
+                result_queue.put(('session_restored', None))
+            else:
+                page = new_page()
+                result_queue.put(('login_required', None))
+            playwright_context['page'] = page
+        except PlaywrightError as e:
+            result_queue.put(('error', f"Could not launch browser: {e}"))
+            return
+
+        while True:
+            try:
+                command, data = command_queue.get()
+
+                if command == 'shutdown':
+                    result_queue.put(('status_update', "Shutting down..."))
+                    if logged_in and not (data and data.get('forget_session')):
+                        # Cookies may have been refreshed while working; keep the newest copy
+                        try:
+                            save_session(page.context)
+                        except (PlaywrightError, OSError) as e:
+                            logging.warning(f"Could not save login session: {e}")
+                    break
+
+                elif command == 'open_login_page':
+                    # The login screen needs its captcha image, so only trackers are blocked until login is verified
+                    blocker.safe_mode = True
+                    try:
+                        goto_portal(page)
+                        result_queue.put(('browser_opened', None))
+                    except PlaywrightError as e:
+                        result_queue.put(('error', f"Could not navigate: {e}"))
+                
+                elif command == 'verify_login':
+                    if probe_login(page):
+                        blocker.safe_mode = False
+                        logged_in = True
+                        result_queue.put(('login_verified', True))
+                    else:
+                        result_queue.put(('login_verified', False))
+                    if logged_in:
+                        try:
+                            save_session(page.context)
+                        except (PlaywrightError, OSError) as e:
+                            logging.warning(f"Could not save login session: {e}")
+                
+                elif command == 'run_uan':
+                    run_uan_extraction(page, data)
+                
+                elif command == 'run_ecr':
+                    run_ecr_extraction(page, data)
+                
+                # --- NEW TASK ADDED HERE ---
+                elif command == 'run_msd':
+                    run_msd_extraction(page, data)
+
+                if command in ('run_uan', 'run_ecr', 'run_msd'):
+                    blocker.log_summary()
+                    # Keep what this task taught about portal latency for the next start
+                    TRACKER.save()
+                    for line in TRACKER.describe():
+                        logging.info(f"Learned latency - {line}")
+
+            except Exception as e:
+                result_queue.put(('error', f"An unexpected error occurred in the worker thread: {e}"))
+
+    if playwright_context.get('browser'):
+        playwright_context['browser'].close()
+
+
+# --- Task Execution Functions (Now called by the worker thread) ---
+def _uan_pool_worker(worker_no, start_url, storage_state, jobs, complete, fail, errors, metrics, breaker):
+    """
+    Runs one member of the UAN pool in its own thread.
+    Each member owns a headless browser whose context is seeded with the
+    logged-in session, so it can search its slice of UANs independently.
+    If the browser fails, every UAN of the slice it had not finished goes to `fail`.
+    """
+    done = 0
+    try:
+        with sync_playwright() as p:
+            with metrics.span('browser_start'):
+                browser = p.chromium.launch(headless=True)
+            blocker = ResourceBlocker()
+            try:
+                context = browser.new_context(storage_state=storage_state)
+                blocker.attach(context)
+                page = context.new_page()
+                capture = ResponseCapture(page) if EXTRACTION_BACKEND == 'xhr' else None
+
+                def reopen():
+                    goto_portal(page, start_url)
+                    open_member_profile(page)
+
+                with metrics.span('navigate'):
+                    reopen()
+                for _, uan in jobs:
+                    result_queue.put(('status_update', f"[Browser {worker_no}] Extracting data for UAN: {uan}..."))
+                    try:
+                        row = with_retries(
+                            lambda: lookup_uan(page, uan, capture=capture, metrics=metrics),
+                            f"[Browser {worker_no}] UAN {uan}", PlaywrightError, breaker, recover=reopen,
+                        )
+                    except (PlaywrightError, CircuitOpenError) as e:
+                        logging.error(f"[Browser {worker_no}] Could not extract all data for UAN {uan}: {e}")
+                        fail(uan, e)
+                    else:
+                        complete(uan, row)
+                    done += 1
+            finally:
+                logging.info(f"[Browser {worker_no}] {blocker.summary()}")
+                browser.close()
+    except PlaywrightError as e:
+        logging.error(f"[Browser {worker_no}] Pool browser failed: {e}")
+        errors.append(f"Browser {worker_no}: {e}")
+        for _, uan in jobs[done:]:
+            fail(uan, f"Browser {worker_no} failed: {e}")
+
+def run_uan_pool(page, uans, pool_size, complete, fail, metrics, breaker):
+    """
+    Extracts UAN details using `pool_size` parallel browser contexts that share
+    the session of `page`. Each row is handed to `complete(uan, row)` as it
+    arrives and each UAN that failed every retry to `fail(uan, error)`. The
+    browsers' spans go into `metrics` and their outcomes into the shared
+    `breaker`. Returns the errors of the pool browsers that failed.
+    """
+    storage_state = page.context.storage_state()
+    start_url = page.url
+    # Interleaved slices keep the browsers at similar positions in the list,
+    # so the in-order output writer never has to hold back many rows
+    slices = split_into_slices(uans, pool_size, interleave=True)
+    errors = []
+
+    result_queue.put(('status_update', f"Starting {len(slices)} parallel browsers for {len(uans)} UANs..."))
+    workers = [
+        threading.Thread(target=_uan_pool_worker, args=(i + 1, start_url, storage_state, jobs, complete, fail, errors, metrics, breaker), daemon=True)
+        for i, jobs in enumerate(slices)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return errors
+
+def run_uan_extraction(page, data):
+    uans = data['uans']
+    output_file = data['output_file']
+    pool_size = min(max(int(data.get('pool_size', 1)), 1), MAX_POOL_SIZE)
+    shards = min(max(int(data.get('shards', 1)), 1), MAX_SHARD_COUNT)
+    result_queue.put(('status_update', "Starting UAN extraction..."))
+    started = time.perf_counter()
+    metrics = RunMetrics('uan')
+
+    # Rows (or None for "no record") are journaled as they come in, so a crashed run can resume
+    journal = Journal(f"uan_{Path(output_file).stem}", resume=data.get('resume', False))
+    pending = journal.pending(uans)
+    if len(pending) < len(uans):
+        result_queue.put(('status_update', f"Resuming: {len(uans) - len(pending)} UANs already done, {len(pending)} to go..."))
+    # UANs that fail every retry are queued beside the journal, which is then kept for a resumed re-run
+    retries = RetryQueue(journal.path.stem)
+    breaker = CircuitBreaker(notify=lambda message: result_queue.put(('status_update', message)))
+
+    # Rows stream into the output in input order while the run is going; journaled rows go first
+    try:
+        sink = open_sink(output_file, UAN_COLUMNS)
+    except (ValueError, OSError) as e:
+        journal.close()
+        result_queue.put(('error', f"Could not open the output file: {e}"))
+        return
+    writer = OrderedWriter(sink, uans)
+    for uan, row in journal.replay():
+        writer.settle(uan, row)
+
+    def fail(uan, error):
+        retries.add(uan, error)
+        writer.settle(uan)
+
+    def complete(uan, row):
+        with metrics.span('journal'):
+            journal.append(uan, row)
+        with metrics.span('write'):
+            writer.settle(uan, row)
+        if row and cache:
+            with metrics.span('cache_store'):
+                cache.put(row)
+
+    # UANs fetched recently enough are answered from the on-disk cache without touching the portal
+    cache = UanCache() if data.get('use_cache', True) else None
+    if cache and pending:
+        with metrics.span('cache_lookup'):
+            cached = cache.get_fresh(pending)
+        for uan in pending:
+            if uan in cached:
+                journal.append(uan, cached[uan])
+                writer.settle(uan, cached[uan])
+        pending = [uan for uan in pending if uan not in cached]
+        if cached:
+            result_queue.put(('status_update', f"{len(cached)} UANs answered from cache, {len(pending)} to look up..."))
+    strategy = choose_uan_strategy(data.get('strategy', 'auto'), len(pending))
+
+    capture = ResponseCapture(page) if EXTRACTION_BACKEND == 'xhr' else None
+    try:
+        if not pending:
+            pass
+        elif strategy == 'harvest':
+            # One read of the whole table answers every UAN, so pools and shards are not needed
+            try:
+                with metrics.span('navigate'):
+                    open_member_profile(page)
+                result_queue.put(('status_update', "Reading the full Member Profile table..."))
+                with metrics.span('harvest'):
+                    members = harvest_member_list(page, capture=capture)
+            except PlaywrightError as e:
+                result_queue.put(('error', f"Could not read the Member Profile table: {e}"))
+                return
+            for uan in pending:
+                if uan not in members:
+                    logging.warning(f"No Member Profile record found for UAN: {uan}")
+                complete(uan, members.get(uan))
+        elif shards > 1 and len(pending) > 1:
+            with metrics.span('shards'):
+                errors = sharding.run_sharded(
+                    page, 'uan', pending, shards, result_queue,
+                    on_result=lambda index, row: complete(pending[index], row),
+                    on_failed=lambda index, message: fail(pending[index], message),
+                )
+            if errors:
+                result_queue.put(('error', "Some shards failed during UAN extraction; their unfinished UANs were queued for retry:\n" + "\n".join(errors)))
+        elif pool_size > 1 and len(pending) > 1:
+            errors = run_uan_pool(page, pending, pool_size, complete, fail, metrics, breaker)
+            if errors:
+                result_queue.put(('error', "Some pool browsers failed; their unfinished UANs were queued for retry:\n" + "\n".join(errors)))
+        else:
+            try:
+                with metrics.span('navigate'):
+                    open_member_profile(page)
+            except PlaywrightError as e:
+                result_queue.put(('error', f"Could not navigate to 'Member Profile': {e}"))
+                return
+
+            def reopen():
+                goto_portal(page)
+                open_member_profile(page)
+
+            # The listing's own first load may already carry some (or all) of the members
+            prefetched = member_records_from_payloads(capture.take()) if capture else {}
+            for uan in pending:
+                if uan in prefetched:
+                    complete(uan, prefetched[uan])
+                    continue
+                result_queue.put(('status_update', f"Extracting data for UAN: {uan}..."))
+                try:
+                    row = with_retries(
+                        lambda: lookup_uan(page, uan, capture=capture, metrics=metrics),
+                        f"UAN {uan}", PlaywrightError, breaker, recover=reopen,
+                    )
+                except (PlaywrightError, CircuitOpenError) as e:
+                    logging.error(f"Could not extract all data for UAN {uan}: {e}")
+                    fail(uan, e)
+                    continue
+                complete(uan, row)
+    finally:
+        if capture:
+            capture.detach()
+        if cache:
+            cache.close()
+        journal.close()
+        with metrics.span('close_output'):
+            writer.finish()
+            close_sink(sink)
+
+    rows_written = sink.rows_written
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"UAN extraction: {rows_written} of {len(uans)} UANs in {elapsed:.1f} s "
+        f"({elapsed * 1000 / max(len(pending), 1):.0f} ms per UAN; the old fixed sleep alone was {LEGACY_UAN_SEARCH_SLEEP_MS} ms per UAN)"
+    )
+    timing = metrics.report()
+    retries.save()
+    if rows_written:
+        if not retries:
+            journal.discard()
+        result_queue.put(('info', f"UAN data extracted and saved to {output_file}{_retry_note(retries, 'UANs')}\n\n{timing}"))
+    else:
+        result_queue.put(('info', f"No UAN data was extracted.{_retry_note(retries, 'UANs')}\n\n{timing}"))
+    result_queue.put(('status_update', "UAN extraction finished."))
+
+def _retry_note(retries, items, rerun="Run the task again with 'Resume previous run' (--resume) to fetch only those."):
+    """Tells the user which items were queued for retry and how to fetch just those."""
+    if not retries:
+        return ""
+    return f"\n\n{len(retries)} {items} still failed after {RETRY_ATTEMPTS} attempts and were queued in {retries.path}. {rerun}"
+
+def run_ecr_extraction(page, data):
+    start_date = data['start_date']; end_date = data['end_date']
+    result_queue.put(('status_update', "Starting ECR PDF extraction..."))
+    metrics = RunMetrics('ecr')
+
+    try:
+        with metrics.span('navigate'):
+            page.click('a:has-text("Payments")'); page.click('a:has-text("Payment (ECR)")')
+            wait_for_navigation(page, 'a:has-text("ECR Upload")', 'ecr_menu_navigation', PAGE_LOAD_TIMEOUT_MS)
+            page.click('a:has-text("ECR Upload")')
+            wait_for_navigation(page, 'table#tbRecentClaimList', 'ecr_navigation', PAGE_LOAD_TIMEOUT_MS)
+    except PlaywrightError as e:
+        result_queue.put(('error', f"Could not navigate to ECR page: {e}"))
+        return
+        
+    # Statements are downloaded once into the local store; every run only fetches TRRNs it does not hold yet
+    store = EcrStore()
+    retries = RetryQueue(f"ecr_{start_date.strftime('%Y%m')}_{end_date.strftime('%Y%m')}")
+    skipped = 0
+    breaker = CircuitBreaker(notify=lambda message: result_queue.put(('status_update', message)))
+    # PDFs with a plain link are fetched in the background while the listing is paged through
+    pool = ThreadPoolExecutor(DOWNLOAD_CONCURRENCY, thread_name_prefix="ecr-download") if ECR_DOWNLOAD_MODE == 'parallel' else None
+    fetches = []
+
+    previous_trrn = None
+    page_no = 1
+    # Pages outside the window are skipped only if the listing says it is sorted by wage month
+    order = None
+    jumped = loaded = False
+    try:
+        while True:
+            if not loaded:
+                try:
+                    waited_ms = wait_for_ecr_page(page, previous_trrn)
+                    metrics.record('page_load', waited_ms / 1000)
+                    logging.info(f"ECR page {page_no} ready after {waited_ms:.0f} ms")
+                except PlaywrightError as e:
+                    if previous_trrn is not None:
+                        logging.error(f"ECR page {page_no} did not load after clicking Next, stopping: {e}")
+                        break
+                    # The first page may simply have no statements; read whatever is there
+                    logging.warning(f"ECR listing did not show any statements: {e}")
+            loaded = False
+            # Every cell of the page in one evaluate; only matching rows touch the DOM again
+            with metrics.span('read_cells'):
+                rows = read_table(page, "table#tbRecentClaimList")['rows']
+            if order is None:
+                try:
+                    direction = ecr_wage_month_sort(page)
+                except PlaywrightError as e:
+                    logging.warning(f"Could not read the ECR listing's sort order: {e}")
+                    direction = None
+                logging.info(f"ECR listing sorted by wage month: {direction or 'no, reading every page'}")
+                order = _WageMonthOrder(start_date, end_date, direction)
+            months = _wage_months(rows)
+            order.add(months)
+            if not jumped and order.before_window(months):
+                jumped = True
+                pager = ecr_pager(page)
+                if pager and pager['pages'] > pager['page'] + 1:
+                    result_queue.put(('status_update', f"Looking for {start_date:%b-%Y} to {end_date:%b-%Y} among {pager['pages']} ECR pages..."))
+                    try:
+                        target = _bisect_to_ecr_window(page, pager, order, metrics)
+                    except PlaywrightError as e:
+                        logging.error(f"ECR page jump failed, stopping: {e}")
+                        break
+                    if target is None:
+                        logging.info("ECR listing: no page reaches the date window")
+                        break
+                    logging.info(f"ECR listing: jumped from page {pager['page'] + 1} to page {target + 1} of {pager['pages']}")
+                    page_no = target + 1
+                    loaded = True
+                    continue
+            if order.past_window(months):
+                logging.info(f"ECR page {page_no}: every statement is past {start_date:%b-%Y}..{end_date:%b-%Y}, stopping")
+                break
+            links = headers = None
+            matched = 0
+            for row_index, cells in enumerate(rows):
+                if len(cells) < 8:
+                    continue # e.g. the "no data" placeholder row
+                try:
+                    wage_month_str = cells[2]
+                    status = cells[7].strip()
+                    if status == "Payment Confirmed":
+                        month_str, year_str = wage_month_str.split('-')
+                        wage_date = datetime(int(year_str), get_month_index(month_str), 1)
+                        if start_date <= wage_date <= end_date:
+                            matched += 1
+                            trrn = cells[1].strip()
+                            if trrn in store:
+                                skipped += 1
+                                continue
+                            if pool and links is None:
+                                links = ecr_pdf_links(page)
+                            url = links[row_index] if links and row_index < len(links) else None
+                            if url:
+                                headers = headers or session_headers(page, url)
+                                fetches.append(pool.submit(
+                                    _fetch_statement, url, headers, store, trrn, wage_month_str, wage_date, retries, breaker, metrics,
+                                ))
+                                continue
+                            result_queue.put(('status_update', f"Downloading PDF for {trrn}..."))
+                            row = page.locator("table#tbRecentClaimList tbody tr").nth(row_index)
+                            pdf_link = row.locator('td:nth-child(10) a')
+                            if pdf_link.count() > 0:
+                                with metrics.span('download'):
+                                    download = TRACKER.run('download_start', DOWNLOAD_START_TIMEOUT_MS, lambda t: _download(page, pdf_link, t))
+                                try:
+                                    with metrics.span('store'):
+                                        store.put_file(trrn, wage_month_str, wage_date, download.path())
+                                except (OSError, sqlite3.Error) as e:
+                                    logging.error(f"Could not store the ECR statement for {trrn}: {e}")
+                                    retries.add(trrn, e)
+                                download.delete()
+                except (PlaywrightError, ValueError) as e:
+                    logging.error(f"Error processing a row: {e}")
+            # Before: rows.all() + 2 inner_text per row + TRRN inner_text and link count per match
+            logging.info(
+                f"ECR page {page_no}: read {len(rows)} rows in 1 evaluate, saving "
+                f"{2 * len(rows) + matched} browser round trips"
+            )
+            next_button = page.locator('a:has-text("Next")')
+            if not next_button.is_visible(): break
+            previous_trrn = first_ecr_trrn(page)
+            next_button.click()
+            page_no += 1
+    finally:
+        if pool:
+            if fetches:
+                result_queue.put(('status_update', f"Waiting for {sum(not f.done() for f in fetches)} of {len(fetches)} PDF downloads..."))
+            with metrics.span('download_drain'):
+                pool.shutdown(wait=True)
+            # _fetch_statement queues its own failures; anything else it raised must not vanish with its future
+            for fetch in fetches:
+                if fetch.exception():
+                    logging.error(f"ECR statement download failed unexpectedly: {fetch.exception()}")
+                    result_queue.put(('error', f"An ECR statement download failed unexpectedly: {fetch.exception()}"))
+    retries.save()
+    logging.info(f"ECR: {skipped} matching statements were already in the store and not downloaded again")
+
+    # The zip holds every stored statement of the range, including ones downloaded by earlier runs
+    zip_filename = f"ECR_Statements_{start_date.strftime('%Y%m')}_to_{end_date.strftime('%Y%m')}.zip"
+    try:
+        with metrics.span('zip'):
+            archived = store.build_archive(zip_filename, start_date, end_date, *zip_settings(data))
+    except (ValueError, OSError) as e:
+        result_queue.put(('error', f"Could not write the archive {zip_filename}: {e}"))
+        archived = 0
+    finally:
+        store.close()
+    table_note = ""
+    if data.get('table_output') and archived:
+        result_queue.put(('status_update', f"Extracting statement figures into {data['table_output']}..."))
+        with metrics.span('parse'):
+            table_note = _parse_statement_table(store.directory, start_date, end_date, data['table_output'])
+    rerun = "Run the task again to fetch only those."
+    if archived:
+        result_queue.put(('info', f"{archived} ECR PDFs zipped to {zip_filename} ({skipped} already stored, not downloaded again){table_note}{_retry_note(retries, 'statements', rerun)}\n\n{metrics.report()}"))
+    else:
+        result_queue.put(('info', f"No matching ECR statements found.{_retry_note(retries, 'statements', rerun)}\n\n{metrics.report()}"))
+    result_queue.put(('status_update', "ECR extraction finished."))
+
+def _parse_statement_table(store_dir, start_date, end_date, output):
+    """Runs ecr_parse.py over the stored statements of the range; returns a note for the summary message."""
+    # A separate process, like the shards: the parser's process pool must not re-import the Tk main.py
+    command = [
+        sys.executable, str(Path(__file__).with_name('ecr_parse.py')), '--store', str(store_dir),
+        '--start', start_date.strftime('%Y-%m'), '--end', end_date.strftime('%Y-%m'), '--output', output,
+    ]
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True, encoding='utf-8')
+    except OSError as e:
+        logging.error(f"Could not start the ECR statement parser: {e}")
+        return f"\nThe statement figures could not be extracted: {e}"
+    try:
+        summary = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        logging.error(f"ECR statement parser exited with {proc.returncode}: {proc.stderr.strip()}")
+        return "\nThe statement figures could not be extracted; see epfo_scraper.log."
+    if 'error' in summary:
+        return f"\nThe statement figures could not be extracted: {summary['error']}"
+    note = f"\nFigures of {summary['parsed']} statements written to {summary['output']}"
+    if summary['failed']:
+        note += f"; {summary['failed']} could not be parsed (see {summary['failures_file']})"
+    return note + "."
+
+def _wage_month(cells):
+    """The wage month of an ECR listing row as a datetime, or None for rows without one."""
+    try:
+        month_str, year_str = cells[2].split('-')
+        return datetime(int(year_str), get_month_index(month_str), 1)
+    except (IndexError, ValueError):
+        return None
+
+def _wage_months(rows):
+    return [month for month in map(_wage_month, rows) if month]
+
+class _WageMonthOrder:
+    """
+    Where the date window lies in the ECR listing. `direction` is the
+    wage-month sort the DataTable reports ('newest_first' or 'oldest_first'),
+    or None when it is sorted by anything else and no page may be skipped.
+    Rows that contradict the reported sort switch skipping off for good.
+    """
+
+    def __init__(self, start_date, end_date, direction=None):
+        self.start_date, self.end_date = start_date, end_date
+        self.direction = direction
+        self.last = None
+
+    def add(self, months):
+        """Records the wage months of the rows read, in listing order."""
+        for month in months:
+            if self.direction and self.last is not None and (
+                month > self.last if self.direction == 'newest_first' else month < self.last
+            ):
+                logging.warning(f"ECR listing: {month:%b-%Y} follows {self.last:%b-%Y}, against its {self.direction} sort; reading every page")
+                self.direction = None
+            self.last = month
+
+    def before_window(self, months):
+        """True if every row of a page comes before the window in listing order."""
+        if not months or not self.direction:
+            return False
+        if self.direction == 'newest_first':
+            return min(months) > self.end_date
+        return max(months) < self.start_date
+
+    def past_window(self, months):
+        """True if every row of a page comes after the window, and so does every later page."""
+        if not months or not self.direction:
+            return False
+        if self.direction == 'newest_first':
+            return max(months) < self.start_date
+        return min(months) > self.end_date
+
+def _bisect_to_ecr_window(page, pager, order, metrics):
+    """
+    Skips the ECR pages that lie entirely before the date window by jumping
+    to pages bisection-style. Returns the 0-based page it leaves loaded, the
+    first one that reaches the window, or None when no page does.
+    """
+    low, high = pager['page'] + 1, pager['pages'] - 1
+    current, found = pager['page'], None
+    while low <= high:
+        middle = (low + high) // 2
+        with metrics.span('page_jump'):
+            jump_to_ecr_page(page, middle)
+            months = _wage_months(read_table(page, "table#tbRecentClaimList")['rows'])
+        current = middle
+        if order.before_window(months):
+            logging.info(f"ECR page jump: page {middle + 1} is entirely before the window")
+            low = middle + 1
+        else:
+            logging.info(f"ECR page jump: page {middle + 1} reaches the window")
+            found, high = middle, middle - 1
+    if found is not None and found != current:
+        with metrics.span('page_jump'):
+            jump_to_ecr_page(page, found)
+    return found
+
+def _fetch_statement(url, headers, store, trrn, wage_month, wage_date, retries, breaker, metrics):
+    """Runs on the download pool: fetches one statement PDF into the store."""
+    try:
+        with metrics.span('download'):
+            spool = with_retries(lambda: fetch_pdf(url, headers), f"ECR statement {trrn}", (OSError, ValueError), breaker)
+    except (OSError, ValueError, CircuitOpenError) as e:
+        logging.error(f"Could not download the ECR statement for {trrn}: {e}")
+        retries.add(trrn, e)
+        return
+    try:
+        with spool, metrics.span('store'):
+            store.put_stream(trrn, wage_month, wage_date, spool)
+    except (OSError, sqlite3.Error) as e:
+        logging.error(f"Could not store the ECR statement for {trrn}: {e}")
+        retries.add(trrn, e)
+        return
+    result_queue.put(('status_update', f"Downloaded PDF for {trrn}"))
+
+def _download(page, link, timeout):
+    """Clicks a download link and returns the Download once it has started."""
+    with page.expect_download(timeout=timeout) as download_info:
+        link.click()
+    return download_info.value
+
+# --- NEW FUNCTION FOR TASK 3 ---
+def run_msd_extraction(page, data):
+    """
+    Navigates to Member Service Details, searches by UAN, and saves tables to Excel files.
+    With 'combined_output' (.csv/.jsonl) every row is instead streamed into that one file.
+    """
+    uans = data['uans']
+    combined_output = data.get('combined_output')
+    shards = min(max(int(data.get('shards', 1)), 1), MAX_SHARD_COUNT)
+    result_queue.put(('status_update', "Starting Member Service Detail extraction..."))
+    metrics = RunMetrics('msd')
+
+    # Each UAN's archive entry (None when the member has no rows) and the archive's id are journaled once saved
+    journal = Journal("msd", resume=data.get('resume', False))
+    resume_id = None
+    for _, entry in journal.replay():
+        resume_id = entry.get('archive') or resume_id
+
+    # Without a combined output, each UAN's workbook is written straight into the zip;
+    # a resumed run appends to it only if it is the very archive the journal refers to
+    zip_filename = "Member_Service_Details.zip"
+    archive = None
+    if not combined_output:
+        try:
+            archive = ArchiveWriter(zip_filename, *zip_settings(data), resume_id=resume_id)
+        except (ValueError, OSError, BadZipFile) as e:
+            journal.close()
+            result_queue.put(('error', f"Could not open the archive {zip_filename}: {e}"))
+            return
+
+    # Journaled UANs whose workbook did not make it into this archive are fetched again
+    lost = set()
+    resumed_rows = 0
+    for uan, entry in journal.replay():
+        if entry.get('entry') and (archive is None or entry.get('archive') != archive.archive_id or entry['entry'] not in archive):
+            lost.add(uan)
+        else:
+            lost.discard(uan)
+        resumed_rows += entry.get('rows', 0)
+    pending = [uan for uan in uans if uan not in journal or uan in lost]
+    if len(pending) < len(uans):
+        result_queue.put(('status_update', f"Resuming: {len(uans) - len(pending)} UANs already done, {len(pending)} to go..."))
+    # A failing UAN is retried, then queued; the batch carries on with the next one
+    retries = RetryQueue(journal.path.stem)
+    breaker = CircuitBreaker(notify=lambda message: result_queue.put(('status_update', message)))
+
+    combined = {}
+
+    def record(uan, headers, rows):
+        entry_name = None
+        with metrics.span('write'):
+            if combined_output and rows:
+                if 'sink' not in combined:
+                    # A resumed run appends to the rows already streamed by the interrupted one
+                    combined['sink'] = open_sink(combined_output, ["UAN"] + headers, append=data.get('resume', False))
+                for row in rows:
+                    combined['sink'].write([uan] + row)
+            elif rows:
+                # Each UAN's service details become their own workbook in the zip
+                entry_name = f"{uan}.xlsx"
+                archive.write_workbook(entry_name, headers, rows)
+                logging.info(f"Archived service details for UAN {uan} as {entry_name}")
+        journal.append(uan, {'entry': entry_name, 'rows': len(rows), 'archive': archive.archive_id if archive else None})
+
+    try:
+        if not pending:
+            pass
+        elif shards > 1 and len(pending) > 1:
+            with metrics.span('shards'):
+                errors = sharding.run_sharded(
+                    page, 'msd', pending, shards, result_queue,
+                    on_result=lambda index, result: record(pending[index], result['headers'], result['rows']),
+                    on_failed=lambda index, message: retries.add(pending[index], message),
+                )
+            if errors:
+                result_queue.put(('error', "Some shards failed during MSD extraction:\n" + "\n".join(errors)))
+        else:
+            capture = ResponseCapture(page) if EXTRACTION_BACKEND == 'xhr' else None
+            try:
+                # Navigate to the correct page once
+                result_queue.put(('status_update', "Navigating to Member Service Details page..."))
+                with metrics.span('navigate'):
+                    open_member_service_details(page)
+            except PlaywrightError as e:
+                result_queue.put(('error', f"Could not navigate to 'Member Service Details': {e}"))
+                if archive:
+                    archive.abort()
+                return
+
+            def reopen():
+                goto_portal(page)
+                open_member_service_details(page)
+
+            try:
+                for uan in pending:
+                    result_queue.put(('status_update', f"Processing UAN: {uan}"))
+                    try:
+                        headers, all_rows_data = with_retries(
+                            lambda: scrape_service_details(
+                                page, uan, lambda msg: result_queue.put(('status_update', msg)), capture=capture, metrics=metrics
+                            ),
+                            f"UAN {uan}", PlaywrightError, breaker, recover=reopen,
+                        )
+                    except (PlaywrightError, CircuitOpenError) as e:
+                        logging.error(f"Could not extract service details for UAN {uan}: {e}")
+                        retries.add(uan, e)
+                        continue
+
+                    # Save data for the current UAN to an Excel file
+                    record(uan, headers, all_rows_data)
+            finally:
+                if capture:
+                    capture.detach()
+    finally:
+        journal.close()
+        if 'sink' in combined:
+            combined['sink'].close()
+    retries.save()
+
+    if combined_output:
+        if resumed_rows or 'sink' in combined:
+            if not retries:
+                journal.discard()
+            result_queue.put(('info', f"Task complete. All service details saved to {combined_output}{_retry_note(retries, 'UANs')}\n\n{metrics.report()}"))
+        else:
+            result_queue.put(('info', f"No data was extracted or saved.{_retry_note(retries, 'UANs')}\n\n{metrics.report()}"))
+        result_queue.put(('status_update', "Member Service Detail extraction finished."))
+        return
+
+    # Every workbook is already in the archive; finishing it only writes the zip directory and renames it
+    with metrics.span('zip'):
+        archived = archive.finish()
+    if archived:
+        if not retries:
+            journal.discard()
+        result_queue.put(('info', f"Task complete. All service details saved to {zip_filename}{_retry_note(retries, 'UANs')}\n\n{metrics.report()}"))
+    else:
+        result_queue.put(('info', f"No data was extracted or saved.{_retry_note(retries, 'UANs')}\n\n{metrics.report()}"))
+    
+    result_queue.put(('status_update', "Member Service Detail extraction finished."))
+
+
+def run_worker():
+    """Runs the worker on the calling thread until it is shut down."""
+    playwright_worker()
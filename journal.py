@@ -0,0 +1,87 @@
+"""
+Crash-safe checkpoint journal for long extraction runs.
+
+Every completed item (a UAN row or a saved MSD workbook) is appended to a
+JSON Lines file and fsync'd as soon as it is captured, so a portal timeout
+or browser crash late in a batch loses at most the item in flight. Running the same task again with resume enabled skips the keys that
+are already journaled and builds the final output from the journal.
+
+Only the set of journaled keys stays in memory; the records themselves are
+read back from the file by `replay()` when a resumed run needs them.
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+JOURNAL_DIR = Path("journals")
+
+
+class Journal:
+    """Append-only JSONL journal of completed items, keyed by UAN."""
+
+    def __init__(self, name, resume=False):
+        JOURNAL_DIR.mkdir(exist_ok=True)
+        self.path = JOURNAL_DIR / f"{name}.jsonl"
+        self.keys = self._load_keys() if resume else set()
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._file.tell() and not self._ends_with_newline():
+            # Terminate a half-written line left by a crash so the next entry starts cleanly
+            self._file.write("\n")
+        if self.keys:
+            logging.info(f"Resuming from {self.path}: {len(self.keys)} items already done")
+
+    def _load_keys(self):
+        return {key for key, _ in self._entries()}
+
+    def _entries(self):
+        if not self.path.exists():
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                    yield entry['key'], entry['record']
+                except (ValueError, KeyError):
+                    # A crash can leave a half-written last line; everything before it is intact
+                    logging.warning(f"Skipping unreadable line {line_no} in {self.path}")
+
+    def replay(self):
+        """Yields (key, record) for every journaled item, reading the file; a key appended twice comes twice."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+        yield from self._entries()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def pending(self, keys):
+        """Returns the keys that still have to be processed, in their original order."""
+        return [k for k in keys if k not in self.keys]
+
+    def append(self, key, record):
+        """Records one completed item and forces it to disk. Safe to call from several threads."""
+        with self._lock:
+            self._file.write(json.dumps({'key': key, 'record': record}) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.keys.add(key)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def discard(self):
+        """Closes and deletes the journal once the task's final output has been written."""
+        self.close()
+        if self.path.exists():
+            os.remove(self.path)
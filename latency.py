@@ -0,0 +1,148 @@
+"""
+Timeouts learned from how long the portal actually takes.
+
+Every wait on the portal is run through `TRACKER.run(kind, default_ms, call)`,
+which passes `call` a timeout and records how long the wait really took. Once
+a kind of wait has enough observations, its timeout becomes a high percentile
+of the recent ones times a safety factor, bounded by a floor and a ceiling;
+until then the old fixed value is used. A wait that runs into its timeout is
+recorded at the timeout, and for the next TIMEOUT_MEMORY waits of that kind
+the timeout is at least twice the one that ran out, so a slow day raises the
+next timeouts instead of failing the same way again. (A single timed-out
+sample among many fast ones would not move the percentile by itself.)
+Every wait has its own kind: a menu that loads in 400 ms must not set the
+timeout of one that can take minutes. `polling(kind)` gives wait_for_function a polling
+interval scaled to the typical wait.
+
+The observations are saved to a JSON file after each task and loaded at the
+next start. EPFO_ADAPTIVE_TIMEOUTS=0 turns learning off and keeps the fixed values.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import percentile
+
+LATENCY_PROFILE_PATH = os.environ.get("EPFO_LATENCY_PROFILE", "latency_profile.json")
+ADAPTIVE_TIMEOUTS = os.environ.get("EPFO_ADAPTIVE_TIMEOUTS", "1") != "0"
+
+# Observations kept per kind of wait; older ones roll off
+WINDOW = 200
+# Observations needed before the learned timeout replaces the fixed one
+MIN_SAMPLES = 10
+PERCENTILE = 0.99
+HEADROOM = 3.0
+FLOOR_MS = 2000
+CEILING_MS = 300000
+# Waits of a kind for which a timeout keeps doubling that kind's timeout
+TIMEOUT_MEMORY = 50
+
+
+class LatencyTracker:
+    def __init__(self, path=LATENCY_PROFILE_PATH, adaptive=ADAPTIVE_TIMEOUTS):
+        self.path = path
+        self.adaptive = adaptive
+        self._samples = {}
+        self._seen = {}
+        # kind -> (timeout that ran out, number of waits seen when it did)
+        self._timed_out = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                saved = json.load(f)
+            for kind, samples in saved.items():
+                self._samples[kind] = deque((float(s) for s in samples), maxlen=WINDOW)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable latency profile {self.path}: {e}")
+
+    def save(self):
+        with self._lock:
+            snapshot = {kind: [round(s, 1) for s in samples] for kind, samples in self._samples.items()}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Could not save latency profile {self.path}: {e}")
+
+    def observe(self, kind, ms):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=WINDOW)).append(ms)
+            self._seen[kind] = self._seen.get(kind, 0) + 1
+
+    def _record_timeout(self, kind, ms):
+        self.observe(kind, ms)
+        with self._lock:
+            self._timed_out[kind] = (ms, self._seen[kind])
+
+    def _recent_timeout(self, kind):
+        """The timeout that ran out within the last TIMEOUT_MEMORY waits of this kind, or 0."""
+        with self._lock:
+            ms, seen_at = self._timed_out.get(kind, (0, 0))
+            return ms if self._seen.get(kind, 0) - seen_at < TIMEOUT_MEMORY else 0
+
+    def _recent(self, kind):
+        with self._lock:
+            return list(self._samples.get(kind, ()))
+
+    def timeout(self, kind, default_ms):
+        """Timeout in ms for the next wait of this kind."""
+        samples = self._recent(kind)
+        if not self.adaptive:
+            return default_ms
+        if len(samples) < MIN_SAMPLES:
+            learned = default_ms
+        else:
+            learned = int(min(CEILING_MS, max(FLOOR_MS, percentile(samples, PERCENTILE) * HEADROOM)))
+        timed_out = self._recent_timeout(kind)
+        if timed_out and learned is not None:
+            learned = max(learned, min(CEILING_MS, timed_out * 2))
+        return learned
+
+    def polling(self, kind):
+        """wait_for_function polling interval: about a tenth of the typical wait, 16-250 ms."""
+        samples = self._recent(kind)
+        if not self.adaptive or len(samples) < MIN_SAMPLES:
+            return 'raf'
+        return int(min(250, max(16, percentile(samples, 0.5) / 10)))
+
+    def run(self, kind, default_ms, call):
+        """Runs `call(timeout_ms)` and records how long it took."""
+        timeout = self.timeout(kind, default_ms)
+        started = time.perf_counter()
+        try:
+            result = call(timeout)
+        except Exception:
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= timeout * 0.95:
+                # Timed out: the real latency is at least the timeout
+                self._record_timeout(kind, timeout)
+                logging.info(f"{kind} wait timed out after {timeout} ms")
+            raise
+        self.observe(kind, (time.perf_counter() - started) * 1000)
+        return result
+
+    def describe(self):
+        """One line per kind: samples, p50 and the timeout currently in force (for the log)."""
+        lines = []
+        with self._lock:
+            kinds = {kind: list(samples) for kind, samples in self._samples.items()}
+        for kind, samples in sorted(kinds.items()):
+            learned = self.timeout(kind, None)
+            lines.append(
+                f"{kind}: {len(samples)} samples, p50 {percentile(samples, 0.5):.0f} ms, "
+                + (f"timeout {learned} ms" if learned else "fixed timeout")
+            )
+        return lines
+
+
+TRACKER = LatencyTracker()
@@ -0,0 +1,101 @@
+"""
+Per-phase timing of extraction runs.
+
+Each run gets a `RunMetrics`; the phases worth knowing about (navigation,
+search redraws, grid loads, the settle sleep, cell reads, downloads, output
+writes, zipping) are wrapped in `metrics.span(name)`. At the end of the run
+`report()` logs count/total/p50/p95/max per phase, appends the same figures
+to a JSON Lines metrics file and returns a short summary for the final
+message.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+METRICS_FILE = os.environ.get("EPFO_METRICS_FILE", "epfo_metrics.jsonl")
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers, or None when it is empty."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class RunMetrics:
+    """Collects span durations per phase for one run. Safe to use from several threads."""
+
+    def __init__(self, task):
+        self.task = task
+        self.started = time.perf_counter()
+        self._started_at = datetime.now()
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started)
+
+    def record(self, phase, seconds):
+        with self._lock:
+            self._durations.setdefault(phase, []).append(seconds)
+
+    def summary(self):
+        """{phase: {count, total_s, p50_ms, p95_ms, max_ms}} in the order phases were first seen."""
+        with self._lock:
+            durations = {phase: list(values) for phase, values in self._durations.items()}
+        return {
+            phase: {
+                'count': len(values),
+                'total_s': round(sum(values), 3),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'max_ms': round(max(values) * 1000, 1),
+            }
+            for phase, values in durations.items()
+        }
+
+    def report(self, limit=4):
+        """Logs and stores the run's figures; returns a one-line summary of the `limit` costliest phases."""
+        summary = self.summary()
+        elapsed = time.perf_counter() - self.started
+        for phase, stats in summary.items():
+            logging.info(
+                f"[{self.task}] {phase}: {stats['count']}x, total {stats['total_s']:.2f} s, "
+                f"p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, max {stats['max_ms']:.0f} ms"
+            )
+        try:
+            with open(METRICS_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    'task': self.task, 'started': self._started_at.isoformat(timespec='seconds'),
+                    'elapsed_s': round(elapsed, 3), 'phases': summary,
+                }) + "\n")
+        except OSError as e:
+            logging.warning(f"Could not write metrics to {METRICS_FILE}: {e}")
+
+        costliest = sorted(summary.items(), key=lambda item: item[1]['total_s'], reverse=True)[:limit]
+        parts = ", ".join(f"{phase} {stats['total_s']:.1f} s ({stats['count']}x)" for phase, stats in costliest)
+        return f"Time: {elapsed:.1f} s" + (f" - {parts}" if parts else "")
+
+
+class _NoMetrics(RunMetrics):
+    """Stand-in for callers that do not collect metrics; spans cost next to nothing."""
+
+    def __init__(self):
+        super().__init__(None)
+
+    def record(self, phase, seconds):
+        pass
+
+
+NO_METRICS = _NoMetrics()
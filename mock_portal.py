@@ -0,0 +1,565 @@
+"""
+Local stand-in for the EPFO employer portal, for offline runs and benchmarks.
+
+Serves the pages, selectors and JSON responses the extractors depend on:
+
+- a login form with a captcha image; any credentials are accepted
+- the Member / Member Profile menus and the #memberList table with DataTables'
+  search box, length select, info line, processing overlay and Next button
+- Payments / Payment (ECR) / ECR Upload with table#tbRecentClaimList (newest
+  wage month first), its Next link, DataTables' page and order API for page
+  jumps and downloadable PDF statements
+- Dashboards / MEMBER SERVICE DETAILS with input#uanNo and the #profileService
+  jqGrid, #load_profileService and #next_profileServicePager
+
+The widgets are emulated in plain JavaScript; apart from the ECR page's
+page API there is no jQuery on the page, so the extractors take their
+non-jQuery fallbacks. Data is synthetic and
+generated from a seed, and every JSON/PDF response is delayed by a
+configurable latency.
+
+Run it and point the app at it:
+
+    python mock_portal.py --members 5000 --ecr-statements 120 --latency-ms 150
+    EPFO_PORTAL_URL=http://127.0.0.1:8765/epfo/ python main.py
+"""
+import argparse
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+import zlib
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+SESSION_COOKIE = "EPFO_MOCK_SESSION"
+MEMBER_LIST_HEADERS = ["UAN", "Name", "Father's/Husband's Name", "Gender", "Date of Birth", "Date of Joining", "Date of Exit"]
+SERVICE_HEADERS = ["Establishment ID", "Establishment Name", "Member ID", "Date of Joining", "Date of Exit", "Reason of Exit"]
+ECR_HEADERS = [
+    "Sr. No.", "TRRN", "Wage Month", "ECR Type", "Upload Date", "Total Members",
+    "Total Amount (Rs.)", "Status", "Payment Date", "Statement",
+]
+ECR_PAGE_SIZE = 10
+SERVICE_PAGE_SIZE = 10
+
+FIRST_NAMES = ["Aarav", "Priya", "Rahul", "Anjali", "Vikram", "Sneha", "Arjun", "Kavya", "Rohan", "Meera", "Suresh", "Lakshmi"]
+LAST_NAMES = ["Sharma", "Patel", "Reddy", "Nair", "Gupta", "Iyer", "Singh", "Das", "Khan", "Joshi", "Menon", "Rao"]
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def _date(rng, start_year, end_year):
+    return f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(start_year, end_year)}"
+
+
+# --- Synthetic data ---
+class PortalData:
+    def __init__(self, members=1000, ecr_statements=60, max_service_rows=25, seed=1):
+        rng = random.Random(seed)
+        self.members = []
+        for i in range(members):
+            exited = rng.random() < 0.3
+            self.members.append([
+                f"10{seed % 10}{i:09d}",
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                rng.choice(["Male", "Female"]),
+                _date(rng, 1965, 2002),
+                _date(rng, 2010, 2020),
+                _date(rng, 2021, 2024) if exited else "",
+            ])
+        self.members_by_uan = {m[0]: m for m in self.members}
+        self.max_service_rows = max_service_rows
+        self.seed = seed
+
+        # Newest wage month first, a few months with a second (arrear) ECR and some unpaid ones
+        self.statements = []
+        today = date.today()
+        year, month = today.year, today.month
+        while len(self.statements) < ecr_statements:
+            for ecr_type in (["Regular", "Arrear"] if rng.random() < 0.15 else ["Regular"]):
+                if len(self.statements) == ecr_statements:
+                    break
+                paid = rng.random() < 0.9
+                self.statements.append({
+                    'trrn': f"{rng.randint(10 ** 12, 10 ** 13 - 1)}",
+                    'wage_month': f"{MONTH_NAMES[month - 1]}-{year}",
+                    'type': ecr_type,
+                    'uploaded': f"15/{month:02d}/{year}",
+                    'members': rng.randint(5, 500),
+                    'amount': f"{rng.randint(10_000, 5_000_000):,}",
+                    'status': "Payment Confirmed" if paid else rng.choice(["Payment Pending", "Challan Generated"]),
+                    'paid_on': f"20/{month:02d}/{year}" if paid else "",
+                })
+            month -= 1
+            if not month:
+                year, month = year - 1, 12
+        self.statements_by_trrn = {s['trrn']: s for s in self.statements}
+
+    def search_members(self, term):
+        term = term.strip().lower()
+        if not term:
+            return self.members
+        return [m for m in self.members if any(term in cell.lower() for cell in m)]
+
+    def service_rows(self, uan):
+        """Service history of one member, or [] for UANs the portal does not know."""
+        member = self.members_by_uan.get(uan)
+        if not member:
+            return []
+        rng = random.Random(f"{self.seed}-{uan}")
+        rows = []
+        for i in range(rng.randint(1, max(self.max_service_rows, 1))):
+            est = f"MHBAN{rng.randint(10 ** 6, 10 ** 7 - 1)}"
+            rows.append([
+                est, f"{rng.choice(LAST_NAMES)} {rng.choice(['Industries', 'Textiles', 'Logistics', 'Foods'])} Pvt Ltd",
+                f"{est}{i:07d}", _date(rng, 2005, 2020), _date(rng, 2020, 2024), rng.choice(["Cessation", "Retirement", ""]),
+            ])
+        return rows
+
+
+def statement_pdf(statement):
+    """A small single-page PDF with the statement's details as text lines in a compressed content stream."""
+    # Split the total the way a challan does: EPF (A/c 1), EPS (A/c 10), EDLI (A/c 21), admin charges (A/c 2)
+    total = int(statement['amount'].replace(",", ""))
+    eps, edli, admin = round(total * 0.35), round(total * 0.02), round(total * 0.02)
+    epf = total - eps - edli - admin
+    lines = [
+        "ELECTRONIC CHALLAN CUM RETURN (ECR) STATEMENT",
+        f"TRRN: {statement['trrn']}",
+        f"Wage Month: {statement['wage_month']}",
+        f"ECR Type: {statement['type']}",
+        f"Total Members: {statement['members']}",
+        f"EPF Contribution (A/c 1): {epf:,}",
+        f"EPS Contribution (A/c 10): {eps:,}",
+        f"EDLI Contribution (A/c 21): {edli:,}",
+        f"Administrative Charges (A/c 2): {admin:,}",
+        f"Total Amount (Rs.): {statement['amount']}",
+        f"Status: {statement['status']}",
+        f"Payment Date: {statement['paid_on']}",
+    ]
+    text = zlib.compress(("BT /F1 11 Tf 50 780 Td 16 TL " + " ".join(
+        "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '" for line in lines
+    ) + " ET").encode('latin-1'))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(text), text),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+# --- Pages ---
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>EPFO Employer Portal (mock)</title>
+<style>
+body { font-family: sans-serif; margin: 0; }
+#menu > ul { display: flex; gap: 2em; list-style: none; margin: 0; padding: 0.6em 1em; background: #1c4e80; }
+#menu li { position: relative; }
+#menu a { color: #fff; text-decoration: none; }
+#menu .submenu { display: none; position: absolute; top: 1.4em; left: 0; background: #1c4e80; list-style: none; padding: 0.4em 1em; white-space: nowrap; z-index: 5; }
+#menu .submenu .submenu { position: static; padding-left: 1em; }
+#menu .submenu.open { display: block; }
+main { padding: 1em; }
+table { border-collapse: collapse; margin-top: 0.5em; }
+td, th { border: 1px solid #bbb; padding: 2px 6px; }
+.overlay { display: none; position: fixed; top: 40%%; left: 40%%; padding: 1em 2em; background: #ffd; border: 1px solid #aa8; }
+.disabled, .ui-state-disabled { opacity: 0.4; pointer-events: none; }
+</style></head>
+<body>
+<nav id="menu"><ul>
+<li><a href="#" data-menu="member-menu">Member</a>
+  <ul id="member-menu" class="submenu"><li><a href="/epfo/member-profile">Member Profile</a></li></ul></li>
+<li><a href="#" data-menu="payments-menu">Payments</a>
+  <ul id="payments-menu" class="submenu"><li><a href="#" data-menu="ecr-menu">Payment (ECR)</a>
+    <ul id="ecr-menu" class="submenu"><li><a href="/epfo/ecr-upload">ECR Upload</a></li></ul></li></ul></li>
+<li><a href="#" data-menu="dashboards-menu">Dashboards</a>
+  <ul id="dashboards-menu" class="submenu"><li><a href="/epfo/member-service-details">MEMBER SERVICE DETAILS</a></li></ul></li>
+<li><a href="/epfo/logout">Logout</a></li>
+</ul></nav>
+<main>%(body)s</main>
+<script>
+document.querySelectorAll('#menu a[data-menu]').forEach(a => a.addEventListener('click', e => {
+    e.preventDefault();
+    document.getElementById(a.dataset.menu).classList.toggle('open');
+}));
+async function getJson(url) {
+    const response = await fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}});
+    return response.json();
+}
+const escapeHtml = s => String(s).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+%(script)s
+</script>
+</body></html>
+"""
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>EPFO Employer Portal (mock) - Sign in</title></head>
+<body>
+<h2>Establishment Sign In</h2>
+<form method="post" action="/epfo/login">
+<p><input name="username" placeholder="Username"></p>
+<p><input name="password" type="password" placeholder="Password"></p>
+<p><img src="/epfo/captcha.svg" alt="captcha"> <input name="captcha" placeholder="Enter the text shown"></p>
+<p><button type="submit">Sign In</button></p>
+</form>
+</body></html>
+"""
+
+CAPTCHA_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="120" height="36"><rect width="120" height="36" fill="#eee"/>'
+    '<text x="12" y="25" font-size="20" font-family="monospace">7Q4KX</text></svg>'
+)
+
+HOME_BODY = "<h2>Welcome, Establishment User</h2><p>Use the menu above.</p>"
+
+MEMBER_LIST_BODY = """
+<h3>Member Profile</h3>
+<div id="memberList_wrapper">
+<label>Show <select name="memberList_length" aria-controls="memberList">
+  <option value="10">10</option><option value="25">25</option><option value="50">50</option>
+  <option value="100">100</option><option value="-1">All</option></select> entries</label>
+<label style="margin-left: 2em">Search: <input type="search" aria-controls="memberList"></label>
+<div id="memberList_processing" class="dataTables_processing overlay">Processing...</div>
+<table id="memberList"><thead><tr>%(headers)s</tr></thead><tbody></tbody></table>
+<div id="memberList_info" role="status"></div>
+<a id="memberList_previous" class="paginate_button previous" href="#">Previous</a>
+<a id="memberList_next" class="paginate_button next" href="#">Next</a>
+</div>
+"""
+
+MEMBER_LIST_SCRIPT = """
+const state = {search: '', start: 0, length: 10, draw: 0};
+const processing = document.getElementById('memberList_processing');
+async function drawMembers() {
+    const draw = ++state.draw;
+    processing.style.display = 'block';
+    const params = new URLSearchParams({draw, start: state.start, length: state.length, search: state.search});
+    const json = await getJson('/epfo/api/members?' + params);
+    if (draw !== state.draw) return;  // a newer draw was requested meanwhile
+    const body = document.querySelector('#memberList tbody');
+    body.innerHTML = json.data.length
+        ? json.data.map(row => '<tr>' + row.map(c => '<td>' + escapeHtml(c) + '</td>').join('') + '</tr>').join('')
+        : '<tr><td class="dataTables_empty" colspan="%(columns)d">No matching records found</td></tr>';
+    const fmt = n => n.toLocaleString('en-US');
+    const first = json.recordsFiltered ? state.start + 1 : 0;
+    let info = `Showing ${fmt(first)} to ${fmt(state.start + json.data.length)} of ${fmt(json.recordsFiltered)} entries`;
+    if (json.recordsFiltered !== json.recordsTotal) info += ` (filtered from ${fmt(json.recordsTotal)} total entries)`;
+    document.getElementById('memberList_info').innerText = info;
+    const last = state.length < 0 || state.start + state.length >= json.recordsFiltered;
+    document.getElementById('memberList_next').className = 'paginate_button next' + (last ? ' disabled' : '');
+    document.getElementById('memberList_previous').className = 'paginate_button previous' + (state.start ? '' : ' disabled');
+    processing.style.display = 'none';
+}
+const searchBox = document.querySelector('input[type="search"][aria-controls="memberList"]');
+const onSearch = () => { if (searchBox.value !== state.search) { state.search = searchBox.value; state.start = 0; drawMembers(); } };
+searchBox.addEventListener('input', onSearch);
+searchBox.addEventListener('keyup', onSearch);
+document.querySelector('select[name="memberList_length"]').addEventListener('change', e => {
+    state.length = Number(e.target.value); state.start = 0; drawMembers();
+});
+document.getElementById('memberList_next').addEventListener('click', e => {
+    e.preventDefault(); state.start += state.length; drawMembers();
+});
+document.getElementById('memberList_previous').addEventListener('click', e => {
+    e.preventDefault(); state.start = Math.max(0, state.start - state.length); drawMembers();
+});
+drawMembers();
+"""
+
+ECR_BODY = """
+<h3>ECR Upload - Recent Returns</h3>
+<div id="tbRecentClaimList_processing" class="dataTables_processing overlay">Processing...</div>
+<table id="tbRecentClaimList"><thead><tr>%(headers)s</tr></thead><tbody></tbody></table>
+<a id="tbRecentClaimList_next" href="#">Next</a>
+"""
+
+ECR_SCRIPT = """
+let ecrPage = 0, ecrPages = 1;
+const ecrProcessing = document.getElementById('tbRecentClaimList_processing');
+const ecrNext = document.getElementById('tbRecentClaimList_next');
+async function drawStatements() {
+    ecrProcessing.style.display = 'block';
+    const json = await getJson('/epfo/api/ecr?page=' + ecrPage);
+    document.querySelector('#tbRecentClaimList tbody').innerHTML = json.data.map((s, i) => '<tr>' + [
+        ecrPage * %(page_size)d + i + 1, s.trrn, s.wage_month, s.type, s.uploaded, s.members, s.amount, s.status, s.paid_on,
+    ].map(c => '<td>' + escapeHtml(c) + '</td>').join('') + '<td>' + (s.status === 'Payment Confirmed'
+        ? '<a href="/epfo/api/ecr/' + s.trrn + '.pdf">View</a>' : '') + '</td></tr>').join('');
+    ecrPages = json.pages;
+    ecrNext.style.display = ecrPage + 1 < json.pages ? '' : 'none';
+    ecrProcessing.style.display = 'none';
+}
+ecrNext.addEventListener('click', e => { e.preventDefault(); ecrPage += 1; drawStatements(); });
+// Just enough of DataTables' API for page jumps: $(table).DataTable().page(n).draw('page') and .page.info(),
+// plus .order() and .column(i).header() to report the sort (Wage Month, newest first)
+const ecrApi = {
+    page: Object.assign(
+        n => { ecrPage = n; return {draw: () => drawStatements()}; },
+        {info: () => ({page: ecrPage, pages: ecrPages})},
+    ),
+    order: () => [[2, 'desc']],
+    column: i => ({header: () => document.querySelectorAll('#tbRecentClaimList thead th')[i]}),
+};
+window.jQuery = () => ({DataTable: () => ecrApi});
+window.jQuery.fn = {dataTable: {isDataTable: selector => selector === '#tbRecentClaimList'}};
+drawStatements();
+"""
+
+SERVICE_BODY = """
+<h3>MEMBER SERVICE DETAILS</h3>
+<label>UAN <input id="uanNo" name="uanNo"></label> <button type="button" id="searchService">Search</button>
+<div id="gbox_profileService" class="ui-jqgrid">
+<div id="load_profileService" class="loading ui-state-default" style="display: none">Loading...</div>
+<div class="ui-jqgrid-hdiv"><table class="ui-jqgrid-htable"><thead><tr class="ui-jqgrid-labels">%(headers)s</tr></thead></table></div>
+<table id="profileService"><tbody><tr class="jqgfirstrow" style="height: 0"></tr></tbody></table>
+<div id="profileServicePager"><table><tr>
+<td id="prev_profileServicePager" class="ui-pg-button ui-state-disabled">&lt; Prev</td>
+<td id="next_profileServicePager" class="ui-pg-button ui-state-disabled">Next &gt;</td>
+<td><div id="profileServicePager_right"></div></td></tr></table></div>
+</div>
+"""
+
+SERVICE_SCRIPT = """
+const grid = {uan: '', page: 1, total: 0};
+const gridLoad = document.getElementById('load_profileService');
+async function loadGrid() {
+    // Shown before the request starts, so a caller waiting for it to hide never sees a stale grid
+    gridLoad.style.display = 'block';
+    const params = new URLSearchParams({uan: grid.uan, page: grid.page, rows: %(page_size)d});
+    const json = await getJson('/epfo/api/service-details?' + params);
+    grid.total = json.total;
+    const offset = (json.page - 1) * %(page_size)d;
+    document.querySelector('#profileService tbody').innerHTML = '<tr class="jqgfirstrow" style="height: 0"></tr>' +
+        json.rows.map((r, i) => '<tr class="jqgrow" id="' + r.id + '"><td class="jqgrid-rownum">' + (offset + i + 1) + '</td>' +
+            r.cell.map(c => '<td>' + escapeHtml(c) + '</td>').join('') + '</tr>').join('');
+    document.getElementById('profileServicePager_right').innerText = json.records
+        ? `View ${offset + 1} - ${offset + json.rows.length} of ${json.records}` : 'Member not found';
+    document.getElementById('next_profileServicePager').className = 'ui-pg-button' + (json.page < json.total ? '' : ' ui-state-disabled');
+    document.getElementById('prev_profileServicePager').className = 'ui-pg-button' + (json.page > 1 ? '' : ' ui-state-disabled');
+    gridLoad.style.display = 'none';
+}
+document.getElementById('searchService').addEventListener('click', () => {
+    grid.uan = document.getElementById('uanNo').value.trim(); grid.page = 1; loadGrid();
+});
+document.getElementById('next_profileServicePager').addEventListener('click', () => {
+    if (grid.page < grid.total) { grid.page += 1; loadGrid(); }
+});
+document.getElementById('prev_profileServicePager').addEventListener('click', () => {
+    if (grid.page > 1) { grid.page -= 1; loadGrid(); }
+});
+"""
+
+
+def _header_cells(headers):
+    return "".join(f"<th>{h}</th>" for h in headers)
+
+
+# --- Server ---
+class MockPortalHandler(BaseHTTPRequestHandler):
+    server_version = "EPFOMock/1.0"
+
+    def log_message(self, format, *args):
+        logging.debug("mock portal: " + format % args)
+
+    @property
+    def portal(self):
+        return self.server.portal
+
+    def _logged_in(self):
+        if self.portal.open_session:
+            return True
+        cookies = self.headers.get('Cookie', '')
+        return any(
+            part.strip() == f"{SESSION_COOKIE}={token}" for token in self.portal.sessions for part in cookies.split(';')
+        )
+
+    def _send(self, status, body, content_type, extra_headers=()):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _page(self, body, script=""):
+        self._send(200, PAGE_TEMPLATE % {'body': body, 'script': script}, 'text/html; charset=utf-8')
+
+    def _json(self, payload):
+        self.portal.delay()
+        self._send(200, json.dumps(payload), 'application/json')
+
+    def _redirect(self, location, extra_headers=()):
+        self.send_response(303)
+        self.send_header('Location', location)
+        for name, value in extra_headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/epfo/login':
+            return self._send(404, "Not found", 'text/plain')
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        token = secrets.token_hex(16)
+        self.portal.sessions.add(token)
+        self._redirect('/epfo/', [('Set-Cookie', f"{SESSION_COOKIE}={token}; Path=/; HttpOnly")])
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path, query = url.path.rstrip('/') or '/', parse_qs(url.query)
+        data = self.portal.data
+
+        if path in ('/', '/epfo') and not self._logged_in():
+            return self._send(200, LOGIN_PAGE, 'text/html; charset=utf-8')
+        if path == '/':
+            return self._redirect('/epfo/')
+        if path == '/epfo/captcha.svg':
+            return self._send(200, CAPTCHA_SVG, 'image/svg+xml')
+        if not self._logged_in():
+            if path.startswith('/epfo/api/'):
+                return self._send(401, json.dumps({'error': 'session expired'}), 'application/json')
+            return self._redirect('/epfo/')
+
+        if path == '/epfo':
+            return self._page(HOME_BODY)
+        if path == '/epfo/logout':
+            self.portal.sessions.clear()
+            return self._redirect('/epfo/')
+        if path == '/epfo/member-profile':
+            return self._page(
+                MEMBER_LIST_BODY % {'headers': _header_cells(MEMBER_LIST_HEADERS)},
+                MEMBER_LIST_SCRIPT % {'columns': len(MEMBER_LIST_HEADERS)},
+            )
+        if path == '/epfo/ecr-upload':
+            return self._page(ECR_BODY % {'headers': _header_cells(ECR_HEADERS)}, ECR_SCRIPT % {'page_size': ECR_PAGE_SIZE})
+        if path == '/epfo/member-service-details':
+            # The first header is jqGrid's row number column
+            return self._page(
+                SERVICE_BODY % {'headers': _header_cells(["Sr. No."] + SERVICE_HEADERS)},
+                SERVICE_SCRIPT % {'page_size': SERVICE_PAGE_SIZE},
+            )
+
+        if path == '/epfo/api/members':
+            arg = lambda name, default: query.get(name, [default])[0]
+            matches = data.search_members(arg('search', ''))
+            start, length = int(arg('start', 0)), int(arg('length', 10))
+            rows = matches[start:] if length < 0 else matches[start:start + length]
+            return self._json({
+                'draw': int(arg('draw', 1)), 'recordsTotal': len(data.members),
+                'recordsFiltered': len(matches), 'data': rows,
+            })
+        if path == '/epfo/api/ecr':
+            page_no = int(query.get('page', ['0'])[0])
+            pages = max(1, -(-len(data.statements) // ECR_PAGE_SIZE))
+            return self._json({
+                'page': page_no, 'pages': pages,
+                'data': data.statements[page_no * ECR_PAGE_SIZE:(page_no + 1) * ECR_PAGE_SIZE],
+            })
+        if path.startswith('/epfo/api/ecr/') and path.endswith('.pdf'):
+            statement = data.statements_by_trrn.get(path[len('/epfo/api/ecr/'):-len('.pdf')])
+            if not statement:
+                return self._send(404, "Not found", 'text/plain')
+            self.portal.delay()
+            return self._send(200, statement_pdf(statement), 'application/pdf', [
+                ('Content-Disposition', f'attachment; filename="ECR_{statement["trrn"]}.pdf"'),
+            ])
+        if path == '/epfo/api/service-details':
+            uan = query.get('uan', [''])[0]
+            page_size = int(query.get('rows', [SERVICE_PAGE_SIZE])[0])
+            rows = data.service_rows(uan)
+            total = max(1, -(-len(rows) // page_size))
+            page_no = min(max(int(query.get('page', ['1'])[0]), 1), total)
+            window = rows[(page_no - 1) * page_size:page_no * page_size]
+            return self._json({
+                'page': page_no, 'total': total, 'records': len(rows),
+                'rows': [{'id': str((page_no - 1) * page_size + i + 1), 'cell': r} for i, r in enumerate(window)],
+            })
+        return self._send(404, "Not found", 'text/plain')
+
+
+class MockPortal:
+    """
+    Runs the mock portal on a background thread; usable as a context manager.
+    `latency_ms` (+ up to `jitter_ms`) delays every JSON and PDF response.
+    With `open_session` every request is treated as logged in.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=100, jitter_ms=50, open_session=False, **data_options):
+        self.data = PortalData(**data_options)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.open_session = open_session
+        self.sessions = set()
+        self._server = ThreadingHTTPServer((host, port), MockPortalHandler)
+        self._server.daemon_threads = True
+        self._server.portal = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/epfo/"
+
+    def delay(self):
+        time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the EPFO employer portal.")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--members', type=int, default=1000, help="rows in the Member Profile table")
+    parser.add_argument('--ecr-statements', type=int, default=60, help="rows in the ECR listing")
+    parser.add_argument('--max-service-rows', type=int, default=25, help="upper bound of service rows per member")
+    parser.add_argument('--latency-ms', type=float, default=100, help="delay added to every JSON/PDF response")
+    parser.add_argument('--jitter-ms', type=float, default=50, help="random extra delay on top of --latency-ms")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--open', action='store_true', help="skip the login form; every visitor is logged in")
+    args = parser.parse_args()
+
+    portal = MockPortal(
+        args.host, args.port, args.latency_ms, args.jitter_ms, args.open,
+        members=args.members, ecr_statements=args.ecr_statements,
+        max_service_rows=args.max_service_rows, seed=args.seed,
+    )
+    print(f"Mock EPFO portal at {portal.url} (set EPFO_PORTAL_URL to this). Ctrl+C to stop.")
+    try:
+        portal._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        portal._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
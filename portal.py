@@ -0,0 +1,496 @@
+"""
+Constants and helpers for driving the EPFO portal with Playwright.
+Nothing in here touches the GUI, so it is safe to import from any thread
+or from the shard processes started by sharding.py.
+"""
+import logging
+import os
+import re
+import time
+
+from latency import TRACKER
+from metrics import NO_METRICS
+from xhr_capture import member_records_from_payloads, jqgrid_rows_from_payloads
+
+# EPFO_PORTAL_URL points the app at another copy of the portal, e.g. mock_portal.py
+PORTAL_URL = os.environ.get("EPFO_PORTAL_URL", "https://unifiedportal-emp.epfindia.gov.in/epfo/")
+# Upper bound for the number of parallel browser contexts / pages per task
+MAX_POOL_SIZE = 8
+# Upper bound for the number of worker processes used by sharded runs
+MAX_SHARD_COUNT = 16
+
+# Upper bound for the Member Profile table to redraw after a UAN search.
+# Replaces the old fixed 2 s sleep, which is kept only as a reference in the logs.
+UAN_SEARCH_TIMEOUT_MS = int(os.environ.get("EPFO_UAN_SEARCH_TIMEOUT_MS", 15000))
+LEGACY_UAN_SEARCH_SLEEP_MS = 2000
+# How the Member Profile task finds UANs: search one at a time, read the whole
+# #memberList table once ('harvest'), or pick by batch size ('auto')
+UAN_STRATEGIES = ('auto', 'search', 'harvest')
+# 'auto' harvests the whole table once a batch has more UANs than this
+HARVEST_THRESHOLD = int(os.environ.get("EPFO_HARVEST_THRESHOLD", 200))
+# Upper bound for one full redraw of #memberList while harvesting
+HARVEST_PAGE_TIMEOUT_MS = int(os.environ.get("EPFO_HARVEST_PAGE_TIMEOUT_MS", 120000))
+# Upper bound for one page of the ECR listing to load (replaces a fixed 20 s sleep per page)
+ECR_PAGE_TIMEOUT_MS = int(os.environ.get("EPFO_ECR_PAGE_TIMEOUT_MS", 60000))
+# Fixed timeouts for the other waits. latency.TRACKER replaces them with learned
+# values once it has seen enough waits of the same kind.
+PAGE_LOAD_TIMEOUT_MS = 200000
+NAVIGATION_TIMEOUT_MS = 60000
+LOGIN_PROBE_TIMEOUT_MS = 5000
+GRID_LOAD_TIMEOUT_MS = 60000
+DOWNLOAD_START_TIMEOUT_MS = 30000
+
+UAN_COLUMNS = ["UAN", "Name", "Joining Date", "Exit Date"]
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def get_month_index(month_str):
+    try:
+        return MONTHS.index(month_str.title()) + 1
+    except ValueError:
+        return -1
+
+
+def split_into_slices(items, count, interleave=False):
+    """
+    Splits items into `count` slices of (input index, item) pairs: contiguous
+    runs by default, or every count-th item when `interleave` is set.
+    """
+    indexed = list(enumerate(items))
+    if interleave:
+        return [s for s in (indexed[i::count] for i in range(count)) if s]
+    size, remainder = divmod(len(indexed), count)
+    slices, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < remainder else 0)
+        if end > start:
+            slices.append(indexed[start:end])
+        start = end
+    return slices
+
+
+# --- Page helpers (sync API) shared by the worker thread, the UAN pool and shard processes ---
+def goto_portal(page, url=PORTAL_URL):
+    """Opens a portal page, waiting as long as page loads have recently needed."""
+    TRACKER.run('page_load', PAGE_LOAD_TIMEOUT_MS, lambda t: page.goto(url, timeout=t, wait_until="domcontentloaded"))
+
+
+def probe_login(page):
+    """True if the logged-in portal menu is showing."""
+    # A failed probe just means "not logged in", so only successful probes are learned from
+    timeout = TRACKER.timeout('login_probe', LOGIN_PROBE_TIMEOUT_MS)
+    started = time.perf_counter()
+    try:
+        page.wait_for_selector('a:has-text("Member")', timeout=timeout)
+    except Exception:
+        return False
+    TRACKER.observe('login_probe', (time.perf_counter() - started) * 1000)
+    return True
+
+
+def wait_for_navigation(page, selector, kind, default_ms=NAVIGATION_TIMEOUT_MS):
+    """Waits for `selector` to appear after a menu click; `kind` names this particular wait for the tracker."""
+    TRACKER.run(kind, default_ms, lambda t: page.wait_for_selector(selector, timeout=t))
+
+
+def open_member_profile(page):
+    """Navigates from the portal menu to the Member Profile listing."""
+    page.click('a:has-text("Member")')
+    page.click('a:has-text("Member Profile")')
+    wait_for_navigation(page, "#memberList", 'member_profile_navigation')
+
+
+# Reads a grid's header labels and the text of every cell of the selected rows in
+# one browser round trip. Row selectors are relative to the table; `limit` caps
+# the number of rows; `headerSelector` is for grids (jqGrid) that keep their
+# header in a separate table.
+READ_TABLE_JS = """
+([tableSelector, rowSelector, headerSelector, limit]) => {
+    const table = document.querySelector(tableSelector);
+    if (!table) return {headers: [], rows: []};
+    const headerCells = headerSelector ? document.querySelectorAll(headerSelector) : table.querySelectorAll('thead th');
+    let rows = Array.from(table.querySelectorAll(rowSelector));
+    if (limit) rows = rows.slice(0, limit);
+    return {
+        headers: Array.from(headerCells, th => th.innerText),
+        rows: rows.map(tr => Array.from(tr.cells, td => td.innerText)),
+    };
+}
+"""
+
+
+def read_table(page, table_selector, row_selector="tbody tr", header_selector=None, limit=None):
+    """
+    Returns {'headers': [...], 'rows': [[cell text, ...], ...]} for a table using a
+    single page.evaluate, instead of one inner_text() round trip per cell.
+    """
+    return page.evaluate(READ_TABLE_JS, [table_selector, row_selector, header_selector, limit])
+
+
+# Marks the rows currently in #memberList so a redraw can be told apart from the old table
+MARK_MEMBER_ROWS_JS = """
+() => document.querySelectorAll('#memberList tbody tr').forEach(tr => tr.setAttribute('data-epfo-stale', '1'))
+"""
+
+# Resolves once the first row of #memberList belongs to the searched UAN ('match'),
+# or DataTables has drawn its fresh "no matching records" row ('empty')
+MEMBER_ROW_READY_JS = """
+(uan) => {
+    const row = document.querySelector('#memberList tbody tr');
+    if (!row) return false;
+    if (row.innerText.includes(uan)) return 'match';
+    if (row.querySelector('td.dataTables_empty') && !row.hasAttribute('data-epfo-stale')) return 'empty';
+    return false;
+}
+"""
+
+
+def lookup_uan(page, uan, capture=None, metrics=NO_METRICS):
+    """
+    Searches the Member Profile table for one UAN and returns its details,
+    or None if the portal has no record for it. Waits for the table to redraw
+    for this UAN instead of sleeping, for a learned timeout. With a ResponseCapture
+    the details come from the search's JSON response when it is recognised.
+    """
+    if capture:
+        capture.clear()
+    with metrics.span('search'):
+        page.evaluate(MARK_MEMBER_ROWS_JS)
+        search_input = page.locator('input[type="search"][aria-controls="memberList"]')
+        search_input.fill(uan); search_input.press('Enter')
+
+    started = time.perf_counter()
+    outcome = TRACKER.run('search_redraw', UAN_SEARCH_TIMEOUT_MS, lambda t: page.wait_for_function(
+        MEMBER_ROW_READY_JS, arg=uan, timeout=t, polling=TRACKER.polling('search_redraw'),
+    )).json_value()
+    waited_ms = (time.perf_counter() - started) * 1000
+    metrics.record('search_redraw', waited_ms / 1000)
+    logging.info(f"UAN {uan}: #memberList redrawn in {waited_ms:.0f} ms (fixed sleep was {LEGACY_UAN_SEARCH_SLEEP_MS} ms)")
+    if outcome == 'empty':
+        logging.warning(f"No Member Profile record found for UAN: {uan}")
+        return None
+
+    if capture:
+        record = member_records_from_payloads(capture.take()).get(uan)
+        if record:
+            return record
+        logging.debug(f"UAN {uan}: search response not recognised, reading the table cells")
+
+    # One evaluate for the first row replaces three inner_text() calls
+    with metrics.span('read_cells'):
+        cells = [c.strip() for c in read_table(page, "#memberList", limit=1)['rows'][0]]
+    return {"UAN": uan, "Name": cells[1], "Joining Date": cells[5], "Exit Date": cells[6]}
+
+
+def choose_uan_strategy(strategy, batch_size):
+    """Resolves 'auto' to 'search' or 'harvest' for a batch of `batch_size` UANs."""
+    if strategy == 'auto':
+        return 'harvest' if batch_size > HARVEST_THRESHOLD else 'search'
+    return strategy
+
+
+# Text of the DataTables "Showing x to y of z entries" line, used to spot redraws
+MEMBER_LIST_INFO_JS = """
+() => { const info = document.querySelector('#memberList_info'); return info ? info.innerText.trim() : null; }
+"""
+
+# Clears any search and asks DataTables for all rows on one page. Returns false
+# when the DataTables API is not reachable, so the caller can use the controls instead.
+SHOW_ALL_MEMBERS_JS = """
+() => {
+    const $ = window.jQuery;
+    if (!$ || !$.fn.dataTable || !$.fn.dataTable.isDataTable('#memberList')) return false;
+    $('#memberList').DataTable().search('').page.len(-1).draw();
+    return true;
+}
+"""
+
+# Resolves once the processing overlay is gone, the info line differs from
+# `previousInfo`, and the body holds as many rows as the info line promises
+MEMBER_LIST_DRAWN_JS = """
+(previousInfo) => {
+    const visible = el => el && el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    if (visible(document.querySelector('#memberList_processing'))) return false;
+    const rows = document.querySelectorAll('#memberList tbody tr');
+    const info = document.querySelector('#memberList_info');
+    if (!info) return rows.length > 0;
+    const text = info.innerText.trim();
+    if (text === previousInfo) return false;
+    const m = text.replace(/,/g, '').match(/(\\d+)\\s+to\\s+(\\d+)\\s+of\\s+(\\d+)/);
+    if (!m) return rows.length > 0;
+    if (Number(m[3]) === 0) return true;
+    return rows.length === Number(m[2]) - Number(m[1]) + 1;
+}
+"""
+
+UAN_PATTERN = re.compile(r"^\d{12}$")
+
+
+INFO_RANGE_PATTERN = re.compile(r"(\d+)\s+to\s+(\d+)\s+of\s+(\d+)")
+
+
+def _wait_for_member_list_redraw(page, previous_info, kind='member_list_page'):
+    """`kind` is 'member_list_all' for the redraw that renders every member, which takes far longer than one page."""
+    TRACKER.run(kind, HARVEST_PAGE_TIMEOUT_MS, lambda t: page.wait_for_function(
+        MEMBER_LIST_DRAWN_JS, arg=previous_info, timeout=t, polling=TRACKER.polling(kind),
+    ))
+
+
+def _shows_every_member(info):
+    """True when the info line says the unfiltered table is already fully on screen."""
+    match = INFO_RANGE_PATTERN.search((info or '').replace(',', ''))
+    return bool(match) and match.group(2) == match.group(3) and 'filtered' not in info.lower()
+
+
+def harvest_member_list(page, capture=None):
+    """
+    Reads the whole Member Profile table once and returns a dict keyed by UAN
+    with the same fields as lookup_uan. Shows all rows on one page when the
+    portal allows it and otherwise walks the table's pages. With a
+    ResponseCapture each page is taken from its JSON response when recognised.
+    """
+    started = time.perf_counter()
+    if capture:
+        capture.clear()
+    info = page.evaluate(MEMBER_LIST_INFO_JS)
+    if _shows_every_member(info):
+        pass
+    elif page.evaluate(SHOW_ALL_MEMBERS_JS):
+        _wait_for_member_list_redraw(page, info, 'member_list_all')
+    else:
+        search_input = page.locator('input[type="search"][aria-controls="memberList"]')
+        if search_input.input_value():
+            search_input.fill(''); search_input.press('Enter')
+            _wait_for_member_list_redraw(page, info)
+            info = page.evaluate(MEMBER_LIST_INFO_JS)
+        length_select = page.locator('select[name="memberList_length"]')
+        if (not _shows_every_member(info) and length_select.count()
+                and length_select.locator('option[value="-1"]').count()):
+            length_select.select_option('-1')
+            _wait_for_member_list_redraw(page, info, 'member_list_all')
+
+    members = {}
+    pages = 0
+    while True:
+        pages += 1
+        captured = member_records_from_payloads(capture.take()) if capture else None
+        if captured:
+            members.update(captured)
+        else:
+            _read_member_list_page(page, members)
+
+        next_button = page.locator('#memberList_next')
+        if not next_button.count() or 'disabled' in (next_button.get_attribute('class') or ''):
+            break
+        info = page.evaluate(MEMBER_LIST_INFO_JS)
+        next_button.click()
+        _wait_for_member_list_redraw(page, info)
+
+    logging.info(f"Harvested {len(members)} members from #memberList over {pages} page(s) in {time.perf_counter() - started:.1f} s")
+    return members
+
+
+def _read_member_list_page(page, members):
+    """Adds the rows currently rendered in #memberList to `members`."""
+    table = read_table(page, "#memberList")
+    uan_col = next((i for i, h in enumerate(table['headers']) if 'UAN' in h.upper()), None)
+    for cells in table['rows']:
+        # The 'no matching records' row has a single cell and is skipped below
+        cells = [c.strip() for c in cells]
+        if uan_col is not None and uan_col < len(cells):
+            uan = cells[uan_col]
+        else:
+            uan = next((c for c in cells if UAN_PATTERN.match(c)), None)
+        if uan and len(cells) >= 7:
+            members[uan] = {"UAN": uan, "Name": cells[1], "Joining Date": cells[5], "Exit Date": cells[6]}
+
+
+FIRST_ECR_TRRN_JS = """
+() => {
+    const cell = document.querySelector('table#tbRecentClaimList tbody tr td:nth-child(2)');
+    return cell ? cell.innerText.trim() : null;
+}
+"""
+
+# Resolves once no loading overlay is visible and the first row's TRRN is present
+# and differs from `previousTrrn` (null on the first page)
+ECR_PAGE_READY_JS = """
+(previousTrrn) => {
+    const visible = el => el && el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    const overlays = document.querySelectorAll('#tbRecentClaimList_processing, .dataTables_processing, .blockUI, .loading');
+    for (const el of overlays) { if (visible(el)) return false; }
+    const cell = document.querySelector('table#tbRecentClaimList tbody tr td:nth-child(2)');
+    if (!cell) return false;
+    const trrn = cell.innerText.trim();
+    return trrn !== '' && trrn !== previousTrrn;
+}
+"""
+
+
+# Absolute URL of each row's PDF link, or null where the row has none (or only a script link)
+ECR_PDF_LINKS_JS = """
+() => Array.from(document.querySelectorAll('table#tbRecentClaimList tbody tr'), tr => {
+    const link = tr.querySelector('td:nth-child(10) a');
+    return link && link.href && !link.href.startsWith('javascript:') ? link.href : null;
+})
+"""
+
+
+def ecr_pdf_links(page):
+    """Returns the PDF link URL of every row of the ECR listing, None where there is no plain link."""
+    return page.evaluate(ECR_PDF_LINKS_JS)
+
+
+# {page, pages} (page is 0-based) when the listing is a DataTable whose page can be set directly, else null
+ECR_PAGER_JS = """
+() => {
+    const $ = window.jQuery;
+    if (!$ || !$.fn || !$.fn.dataTable || !$.fn.dataTable.isDataTable('#tbRecentClaimList')) return null;
+    const info = $('#tbRecentClaimList').DataTable().page.info();
+    return {page: info.page, pages: info.pages};
+}
+"""
+
+# The primary sort of the ECR DataTable: {column: header text, direction: 'asc' | 'desc'}, else null
+ECR_SORT_JS = """
+() => {
+    const $ = window.jQuery;
+    if (!$ || !$.fn || !$.fn.dataTable || !$.fn.dataTable.isDataTable('#tbRecentClaimList')) return null;
+    const table = $('#tbRecentClaimList').DataTable();
+    const order = table.order();
+    if (!order || !order.length) return null;
+    const header = table.column(order[0][0]).header();
+    return {column: header ? header.innerText.trim() : '', direction: order[0][1]};
+}
+"""
+
+ECR_JUMP_JS = """
+(pageIndex) => { window.jQuery('#tbRecentClaimList').DataTable().page(pageIndex).draw('page'); }
+"""
+
+
+def ecr_pager(page):
+    """Returns {'page', 'pages'} of the ECR listing if it can jump straight to a page, else None."""
+    return page.evaluate(ECR_PAGER_JS)
+
+
+def ecr_wage_month_sort(page):
+    """'newest_first' or 'oldest_first' if the ECR DataTable is sorted by its Wage Month column, else None."""
+    order = page.evaluate(ECR_SORT_JS)
+    if not order or not re.fullmatch(r"wage\s*month", order['column'], re.IGNORECASE):
+        return None
+    return 'newest_first' if order['direction'] == 'desc' else 'oldest_first'
+
+
+def jump_to_ecr_page(page, page_index):
+    """Shows page `page_index` (0-based) of the ECR listing and returns how long it took to load in ms."""
+    previous_trrn = first_ecr_trrn(page)
+    page.evaluate(ECR_JUMP_JS, page_index)
+    return wait_for_ecr_page(page, previous_trrn)
+
+
+def first_ecr_trrn(page):
+    """Returns the TRRN of the first row currently shown in the ECR listing, or None."""
+    return page.evaluate(FIRST_ECR_TRRN_JS)
+
+
+def wait_for_ecr_page(page, previous_trrn=None):
+    """
+    Waits until a page of table#tbRecentClaimList has finished loading and
+    returns how long that took in ms. After clicking "Next", pass the TRRN
+    that was first on the old page so a stale table is not mistaken for the new one.
+    """
+    started = time.perf_counter()
+    TRACKER.run('ecr_page', ECR_PAGE_TIMEOUT_MS, lambda t: page.wait_for_function(
+        ECR_PAGE_READY_JS, arg=previous_trrn, timeout=t, polling=TRACKER.polling('ecr_page'),
+    ))
+    return (time.perf_counter() - started) * 1000
+
+
+def open_member_service_details(page):
+    """Navigates from the portal menu to the Member Service Details dashboard."""
+    page.click('a:has-text("Dashboards")')
+    page.click('a:has-text("MEMBER SERVICE DETAILS")')
+    wait_for_navigation(page, 'input#uanNo', 'msd_navigation')
+
+
+def _wait_for_grid_load(page):
+    TRACKER.run('grid_load', GRID_LOAD_TIMEOUT_MS, lambda t: page.wait_for_selector(
+        '#load_profileService', state='hidden', timeout=t,
+    ))
+
+
+# colModel names of the service details grid, without jqGrid's own helper columns
+JQGRID_COLUMN_NAMES_JS = """
+() => {
+    const $ = window.jQuery;
+    if (!$ || !$.fn.jqGrid) return null;
+    const model = $('#profileService').jqGrid('getGridParam', 'colModel') || [];
+    return model.map(c => c.name).filter(n => !['rn', 'cb', 'subgrid'].includes(n));
+}
+"""
+
+
+def scrape_service_details(page, uan, report=None, capture=None, metrics=NO_METRICS):
+    """
+    Searches one UAN on Member Service Details and returns (headers, rows)
+    collected across every page of the jqGrid. `report` receives progress text.
+    With a ResponseCapture each grid page is read from its JSON response when
+    recognised, and from the rendered cells otherwise.
+    """
+    if capture:
+        capture.clear()
+    with metrics.span('search'):
+        page.fill('input#uanNo', uan)
+        page.click('button:has-text("Search")')
+
+    # Wait for the table grid to reload after search
+    with metrics.span('grid_load'):
+        _wait_for_grid_load(page)
+    with metrics.span('settle_sleep'):
+        page.wait_for_timeout(1000) # Small delay for safety
+
+    # Headers and the first page of rows come back together in one evaluate
+    with metrics.span('read_cells'):
+        table = read_table(page, "table#profileService", "tbody tr.jqgrow", ".ui-jqgrid-htable .ui-jqgrid-labels th")
+    # The first column is a blank number column, so we can skip it.
+    headers = [h.strip() for h in table['headers'] if h.strip()][1:]
+    column_names = page.evaluate(JQGRID_COLUMN_NAMES_JS) if capture else None
+
+    all_rows_data = []
+
+    # Handle pagination
+    while True:
+        page_rows = jqgrid_rows_from_payloads(capture.take(), column_names, len(headers)) if capture else None
+        if page_rows is None:
+            if table is None:
+                with metrics.span('read_cells'):
+                    table = read_table(page, "table#profileService", "tbody tr.jqgrow")
+            # Skip the first cell (row number)
+            page_rows = [cells[1:] for cells in table['rows']]
+            cells_read = sum(len(cells) for cells in table['rows'])
+            logging.info(
+                f"UAN {uan}: read {len(page_rows)} grid rows in 1 evaluate "
+                f"(cell-by-cell scraping took {1 + cells_read} round trips)"
+            )
+        table = None
+
+        if not page_rows and not all_rows_data: # Check if member not found on first page
+            if "Member not found" in page.locator("#profileServicePager_right").inner_text():
+                logging.warning(f"Member not found for UAN: {uan}")
+                break
+
+        all_rows_data.extend(page_rows)
+
+        # Check for next page
+        next_button = page.locator("#next_profileServicePager")
+        if "ui-state-disabled" in (next_button.get_attribute("class") or ""):
+            break
+        if report:
+            report(f"UAN {uan}: Found multiple pages, going to next page...")
+        with metrics.span('grid_load'):
+            next_button.click()
+            _wait_for_grid_load(page)
+
+    return headers, all_rows_data
@@ -0,0 +1,151 @@
+"""
+Retries and a circuit breaker for per-item portal failures.
+
+`with_retries` runs one item's extraction up to RETRY_ATTEMPTS times, sleeping
+an exponentially growing, fully jittered delay between attempts and calling a
+`recover` step (e.g. re-opening the page) first. A `CircuitBreaker` shared by
+the whole batch watches the outcome of the last few items: when most of them
+failed it pauses the batch instead of burning through the list, then lets it
+continue; after BREAKER_MAX_TRIPS pauses in a row without a success it gives up
+with `CircuitOpenError`.
+
+Items that still fail go into a `RetryQueue`, saved next to the task's journal.
+The journal is kept in that case, so running the same task again with
+"Resume" fetches only the queued items.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from journal import JOURNAL_DIR
+
+RETRY_ATTEMPTS = int(os.environ.get("EPFO_RETRY_ATTEMPTS", 3))
+RETRY_BASE_DELAY_S = float(os.environ.get("EPFO_RETRY_BASE_DELAY_S", 2))
+RETRY_MAX_DELAY_S = 30
+
+# The breaker trips when at least this share of the last BREAKER_WINDOW items failed
+BREAKER_WINDOW = 10
+BREAKER_FAILURE_RATE = 0.5
+BREAKER_COOLDOWN_S = float(os.environ.get("EPFO_BREAKER_COOLDOWN_S", 60))
+BREAKER_MAX_COOLDOWN_S = 600
+BREAKER_MAX_TRIPS = 5
+
+
+class CircuitOpenError(Exception):
+    """The portal kept failing through every pause; the rest of the batch should be queued for retry."""
+
+
+def backoff_delay(attempt, base=RETRY_BASE_DELAY_S, cap=RETRY_MAX_DELAY_S):
+    """Full-jitter exponential backoff: a random delay up to base * 2**attempt, at most `cap` seconds."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Pauses a batch while the portal's recent error rate is high. Safe to share between threads."""
+
+    def __init__(self, notify=None, window=BREAKER_WINDOW, failure_rate=BREAKER_FAILURE_RATE, cooldown_s=BREAKER_COOLDOWN_S):
+        self.notify = notify or (lambda message: None)
+        self.failure_rate = failure_rate
+        self.base_cooldown_s = cooldown_s
+        self.cooldown_s = cooldown_s
+        self.trips = 0
+        self._outcomes = deque(maxlen=window)
+        self._open_until = 0.0
+        self._half_open = False
+        self._lock = threading.Lock()
+
+    def record(self, ok):
+        """Records one item's final outcome and trips the breaker if the failure rate is too high."""
+        with self._lock:
+            if ok:
+                if self._half_open:
+                    # The first item after a pause went through: the portal has recovered
+                    self._half_open = False
+                    self._outcomes.clear()
+                self.trips = 0
+                self.cooldown_s = self.base_cooldown_s
+                self._outcomes.append(True)
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            # Right after a pause a single failure is enough to pause again
+            if not self._half_open and (len(self._outcomes) < self._outcomes.maxlen or failures < self.failure_rate * len(self._outcomes)):
+                return
+            reason = "still failing after a pause" if self._half_open else f"{failures} of the last {len(self._outcomes)} items failed"
+            message = f"{reason}; pausing for {self.cooldown_s:.0f} s"
+            self.trips += 1
+            self._open_until = time.monotonic() + self.cooldown_s
+            self._outcomes.clear()
+            self._half_open = True
+            self.cooldown_s = min(self.cooldown_s * 2, BREAKER_MAX_COOLDOWN_S)
+        logging.warning(f"Circuit breaker open: {message}")
+        self.notify(f"Portal errors are spiking - {message}...")
+
+    def wait(self):
+        """Blocks while the breaker is open. Raises CircuitOpenError once it has tripped too often in a row."""
+        with self._lock:
+            if self.trips >= BREAKER_MAX_TRIPS:
+                raise CircuitOpenError(f"the portal kept failing after {self.trips} pauses")
+            remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+
+def with_retries(call, label, errors, breaker=None, recover=None, attempts=RETRY_ATTEMPTS):
+    """
+    Returns `call()`, retrying on any of `errors` with jittered exponential
+    backoff. `recover()` runs before each retry to put the page back in a known
+    state. The final outcome is recorded on `breaker`; the last error is re-raised.
+    """
+    for attempt in range(attempts):
+        if breaker:
+            breaker.wait()
+        try:
+            if attempt and recover:
+                recover()
+            result = call()
+        except errors as e:
+            if attempt + 1 == attempts:
+                if breaker:
+                    breaker.record(False)
+                raise
+            delay = backoff_delay(attempt)
+            logging.warning(f"{label} failed (attempt {attempt + 1} of {attempts}), retrying in {delay:.1f} s: {e}")
+            time.sleep(delay)
+        else:
+            if breaker:
+                breaker.record(True)
+            return result
+
+
+class RetryQueue:
+    """Items that failed every attempt, with the last error of each, saved beside the task's journal."""
+
+    def __init__(self, name):
+        self.path = JOURNAL_DIR / f"{name}.retry.json"
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def add(self, item, reason):
+        with self._lock:
+            self.items[item] = str(reason).splitlines()[0] if str(reason) else type(reason).__name__
+
+    def __len__(self):
+        return len(self.items)
+
+    def save(self):
+        """Writes the queue, or removes the old one when nothing failed this time."""
+        if not self.items:
+            if self.path.exists():
+                os.remove(self.path)
+            return
+        JOURNAL_DIR.mkdir(exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'items': self.items}, f, indent=1)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Queued {len(self.items)} failed items for retry in {self.path}")
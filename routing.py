@@ -0,0 +1,100 @@
+"""
+Request routing that keeps the portal from loading what the extractors never use.
+
+A `ResourceBlocker` is attached to a browser context with `context.route` and
+aborts images, fonts, media and known third-party trackers. While the user is
+on the manual-login screen the blocker runs in safe mode, where only trackers
+are blocked so the captcha image and the page's styling load normally.
+
+Aborted requests have no response, so bytes saved are estimated from the sizes
+of responses of the same URL or resource type that were allowed through.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+
+def _env_list(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return list(default)
+    return [item.strip().lower() for item in value.split(',') if item.strip()]
+
+
+BLOCKED_RESOURCE_TYPES = _env_list("EPFO_BLOCK_RESOURCE_TYPES", ["image", "font", "media"])
+BLOCKED_HOSTS = _env_list("EPFO_BLOCK_HOSTS", [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "facebook.com", "hotjar.com", "clarity.ms", "scorecardresearch.com",
+])
+# URL fragments that are never blocked, whatever their type
+ALLOWED_URL_PARTS = _env_list("EPFO_ALLOW_URLS", ["captcha"])
+
+# Fallback size per resource type when nothing of that type has been seen yet
+TYPICAL_SIZES = {"image": 20_000, "font": 40_000, "media": 200_000, "script": 30_000}
+
+
+class ResourceBlocker:
+    def __init__(self, block_types=None, block_hosts=None, allow_parts=None):
+        self.block_types = set(BLOCKED_RESOURCE_TYPES if block_types is None else block_types)
+        self.block_hosts = list(BLOCKED_HOSTS if block_hosts is None else block_hosts)
+        self.allow_parts = list(ALLOWED_URL_PARTS if allow_parts is None else allow_parts)
+        self.safe_mode = False
+        self.blocked = Counter()
+        self.bytes_saved = 0
+        self._url_sizes = {}
+        self._type_sizes = {}
+        self._lock = threading.Lock()
+
+    def attach(self, context):
+        context.route("**/*", self._handle)
+        context.on("response", self._learn_size)
+
+    def _is_tracker(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        return any(host == h or host.endswith("." + h) for h in self.block_hosts)
+
+    def should_block(self, url, resource_type):
+        lowered = url.lower()
+        if any(part in lowered for part in self.allow_parts):
+            return False
+        if self._is_tracker(url):
+            return True
+        return not self.safe_mode and resource_type in self.block_types
+
+    def _handle(self, route):
+        request = route.request
+        if self.should_block(request.url, request.resource_type):
+            self._count(request.url, request.resource_type)
+            route.abort()
+        else:
+            route.continue_()
+
+    def _count(self, url, resource_type):
+        with self._lock:
+            size = self._url_sizes.get(url) or self._type_sizes.get(resource_type) or TYPICAL_SIZES.get(resource_type, 0)
+            self.blocked[resource_type] += 1
+            self.bytes_saved += size
+
+    def _learn_size(self, response):
+        length = response.headers.get("content-length")
+        if not length or not length.isdigit():
+            return
+        size = int(length)
+        resource_type = response.request.resource_type
+        with self._lock:
+            self._url_sizes[response.url] = size
+            # Running average per type, used for URLs that were never loaded
+            previous = self._type_sizes.get(resource_type)
+            self._type_sizes[resource_type] = size if previous is None else (previous * 7 + size) // 8
+
+    def summary(self):
+        total = sum(self.blocked.values())
+        if not total:
+            return "Request blocker: nothing blocked"
+        by_type = ", ".join(f"{t} {n}" for t, n in self.blocked.most_common())
+        return f"Request blocker: {total} requests blocked ({by_type}), ~{self.bytes_saved / 1024:.0f} KB saved"
+
+    def log_summary(self):
+        logging.info(self.summary())
@@ -0,0 +1,36 @@
+"""
+Saved login session.
+
+After a login is verified the browser context's storage_state (cookies and
+local storage) is written to disk, so the next launch can reuse it instead of
+asking for a manual login again. The file grants access to the EPFO account
+and is removed when the user logs out.
+"""
+import logging
+import os
+from pathlib import Path
+
+SESSION_PATH = Path(os.environ.get("EPFO_SESSION_FILE", "epfo_session.json"))
+
+
+def saved_session():
+    """Returns the path of the saved storage_state, or None if there is none."""
+    return str(SESSION_PATH) if SESSION_PATH.exists() else None
+
+
+def save_session(context):
+    """Writes the context's storage_state atomically, readable by the current user only."""
+    tmp_path = SESSION_PATH.with_suffix(".tmp")
+    context.storage_state(path=tmp_path)
+    try:
+        os.chmod(tmp_path, 0o600)
+    except OSError:
+        pass
+    os.replace(tmp_path, SESSION_PATH)
+    logging.info(f"Saved login session to {SESSION_PATH}")
+
+
+def forget_session():
+    if SESSION_PATH.exists():
+        os.remove(SESSION_PATH)
+        logging.info(f"Removed saved login session {SESSION_PATH}")
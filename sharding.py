@@ -0,0 +1,189 @@
+"""
+Multi-process sharding for very large UAN batches.
+
+The coordinator (`run_sharded`, called from the worker thread) saves the
+logged-in session to a file, splits the UAN list into interleaved slices and
+starts one Python process per slice. Every shard process launches its own
+headless Chromium seeded from that saved session, works through its slice and
+streams results back as JSON lines on stdout. The coordinator merges them in
+input order and forwards per-shard progress to the GUI status bar.
+
+Shards are started with `python sharding.py` rather than multiprocessing so
+the child never re-imports main.py (which builds the Tk window at import).
+"""
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from portal import split_into_slices
+
+
+def run_sharded(page, kind, uans, shard_count, result_queue, on_result=None, on_failed=None):
+    """
+    Runs a 'uan' or 'msd' batch across `shard_count` processes.
+    Returns the list of shard errors. Results are not kept: `on_result(index,
+    result)` is called on the coordinator as each one arrives, and
+    `on_failed(index, message)` for each item that failed every retry in its
+    shard, or that a shard never reached because it could not start or died
+    part way.
+    """
+    # Interleaved so shards advance through the list together and in-order output is not held back
+    slices = split_into_slices(uans, shard_count, interleave=True)
+    errors = []
+    settled = set()
+    events = queue.Queue()
+    progress = {shard_no: [0, len(jobs)] for shard_no, jobs in enumerate(slices, 1)}
+
+    session_dir = tempfile.mkdtemp(prefix="epfo_shards_")
+    state_path = os.path.join(session_dir, "session.json")
+    try:
+        page.context.storage_state(path=state_path)
+        result_queue.put(('status_update', f"Starting {len(slices)} shard processes for {len(uans)} UANs..."))
+
+        processes = []
+        for shard_no, jobs in enumerate(slices, 1):
+            spec = {
+                'shard': shard_no, 'kind': kind, 'start_url': page.url,
+                'storage_state': state_path, 'jobs': jobs,
+            }
+            proc = subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve())],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, encoding='utf-8',
+            )
+            proc.stdin.write(json.dumps(spec))
+            proc.stdin.close()
+            threading.Thread(target=_read_shard_output, args=(shard_no, proc.stdout, events), daemon=True).start()
+            processes.append(proc)
+
+        running = len(processes)
+        while running:
+            shard_no, event = events.get()
+            event_type = event.get('type')
+            if event_type == 'result':
+                settled.add(event['index'])
+                if on_result:
+                    on_result(event['index'], event['result'])
+            elif event_type == 'failed':
+                settled.add(event['index'])
+                logging.error(f"[Shard {shard_no}] UAN {uans[event['index']]}: {event['message']}")
+                if on_failed:
+                    on_failed(event['index'], event['message'])
+            elif event_type == 'progress':
+                progress[shard_no][0] = event['done']
+                result_queue.put(('status_update', _format_progress(progress)))
+            elif event_type == 'error':
+                logging.error(f"[Shard {shard_no}] {event['message']}")
+                errors.append(f"Shard {shard_no}: {event['message']}")
+            elif event_type == 'eof':
+                running -= 1
+
+        for shard_no, proc in enumerate(processes, 1):
+            if proc.wait() != 0:
+                errors.append(f"Shard {shard_no}: process exited with code {proc.returncode}")
+        # Whatever a failed shard did not get to is reported as failed, never silently dropped
+        for shard_no, jobs in enumerate(slices, 1):
+            unfinished = [index for index, _ in jobs if index not in settled]
+            if not unfinished:
+                continue
+            reason = next((e for e in errors if e.startswith(f"Shard {shard_no}:")), f"Shard {shard_no} stopped early")
+            logging.error(f"[Shard {shard_no}] {len(unfinished)} UANs were not processed: {reason}")
+            if on_failed:
+                for index in unfinished:
+                    on_failed(index, reason)
+    finally:
+        # The saved session holds live cookies, so never leave it behind
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        os.rmdir(session_dir)
+
+    return errors
+
+
+def _read_shard_output(shard_no, stream, events):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            events.put((shard_no, json.loads(line)))
+        except ValueError:
+            logging.warning(f"[Shard {shard_no}] Unexpected output: {line}")
+    events.put((shard_no, {'type': 'eof'}))
+
+
+def _format_progress(progress):
+    done = sum(d for d, _ in progress.values())
+    total = sum(t for _, t in progress.values())
+    shards = " | ".join(f"#{n} {d}/{t}" for n, (d, t) in sorted(progress.items()))
+    return f"Sharded run {done}/{total}: {shards}"
+
+
+# --- Shard process side ---
+def _emit(event):
+    sys.stdout.write(json.dumps(event) + "\n")
+    sys.stdout.flush()
+
+
+def shard_main(spec):
+    """Runs one shard: its own browser, its own slice of UANs."""
+    from playwright.sync_api import sync_playwright, Error as PlaywrightError
+    from portal import goto_portal, open_member_profile, lookup_uan, open_member_service_details, scrape_service_details
+    from retry import CircuitBreaker, CircuitOpenError, with_retries
+    from routing import ResourceBlocker
+    from xhr_capture import EXTRACTION_BACKEND, ResponseCapture
+
+    shard_no, kind = spec['shard'], spec['kind']
+    blocker = ResourceBlocker()
+    with sync_playwright() as p:
+        browser = None
+        try:
+            browser = p.chromium.launch(headless=True)
+            context = browser.new_context(storage_state=spec['storage_state'])
+            blocker.attach(context)
+            page = context.new_page()
+            capture = ResponseCapture(page) if EXTRACTION_BACKEND == 'xhr' else None
+
+            def reopen():
+                goto_portal(page, spec['start_url'])
+                if kind == 'uan':
+                    open_member_profile(page)
+                else:
+                    open_member_service_details(page)
+
+            reopen()
+        except PlaywrightError as e:
+            _emit({'type': 'error', 'message': f"Could not open the portal: {e}"})
+            if browser:
+                browser.close()
+            return 1
+
+        def extract(uan):
+            if kind == 'uan':
+                return lookup_uan(page, uan, capture=capture)
+            headers, rows = scrape_service_details(page, uan, capture=capture)
+            return {'headers': headers, 'rows': rows}
+
+        breaker = CircuitBreaker()
+        for done, (index, uan) in enumerate(spec['jobs'], 1):
+            try:
+                result = with_retries(lambda: extract(uan), f"[Shard {shard_no}] UAN {uan}", PlaywrightError, breaker, recover=reopen)
+                _emit({'type': 'result', 'index': index, 'result': result})
+            except (PlaywrightError, CircuitOpenError) as e:
+                logging.error(f"[Shard {shard_no}] Could not extract data for UAN {uan}: {e}")
+                _emit({'type': 'failed', 'index': index, 'message': str(e).splitlines()[0] if str(e) else type(e).__name__})
+            _emit({'type': 'progress', 'done': done})
+        logging.info(f"[Shard {shard_no}] {blocker.summary()}")
+        browser.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename='epfo_scraper.log', level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(shard_main(json.load(sys.stdin)))
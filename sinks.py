@@ -0,0 +1,140 @@
+"""
+Streaming output writers.
+
+Rows are appended to the output as they are extracted instead of being
+collected into a DataFrame and written at the end, so memory stays flat
+however large the batch is. CSV and JSON Lines outputs are flushed after
+every row and can be opened while a run is still going; Excel output uses
+openpyxl's write-only mode, which streams rows to a temporary file and
+assembles the workbook when the sink is closed.
+"""
+import csv
+import json
+import os
+import threading
+from pathlib import Path
+
+SINK_SUFFIXES = ('.xlsx', '.csv', '.jsonl')
+# The ECR statement table (ecr_parse.py) can also be Parquet, written through pandas
+TABLE_SUFFIXES = SINK_SUFFIXES + ('.parquet',)
+
+
+class CsvSink:
+    def __init__(self, path, columns, append=False):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.rows_written = 0
+        write_header = not (append and self.path.exists() and self.path.stat().st_size)
+        # utf-8-sig so Excel opens names with non-ASCII characters correctly
+        self._file = open(self.path, 'a' if append else 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.writer(self._file)
+        if write_header:
+            self._writer.writerow(self.columns)
+
+    def write(self, row):
+        self._writer.writerow(_values(row, self.columns))
+        self._file.flush()
+        self.rows_written += 1
+
+    def close(self):
+        self._file.close()
+
+
+class JsonlSink:
+    def __init__(self, path, columns, append=False):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.rows_written = 0
+        self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+
+    def write(self, row):
+        self._file.write(json.dumps(dict(zip(self.columns, _values(row, self.columns))), ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.rows_written += 1
+
+    def close(self):
+        self._file.close()
+
+
+class ExcelSink:
+    def __init__(self, path, columns, append=False):
+        from openpyxl import Workbook
+
+        if append:
+            raise ValueError("Excel output cannot be appended to; use a .csv or .jsonl file instead.")
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.rows_written = 0
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("Sheet1")
+        self._sheet.append(self.columns)
+
+    def write(self, row):
+        self._sheet.append(_values(row, self.columns))
+        self.rows_written += 1
+
+    def close(self, target=None):
+        """Assembles the workbook into its file, or into the writable binary stream `target` instead."""
+        self._workbook.save(target or self.path)
+
+
+def _values(row, columns):
+    """Accepts either a dict keyed by column name or a sequence in column order."""
+    if isinstance(row, dict):
+        return [row.get(c, "") for c in columns]
+    return list(row)
+
+
+def open_sink(path, columns, append=False):
+    """Returns the sink matching the file extension of `path` (.xlsx, .csv or .jsonl)."""
+    suffix = Path(path).suffix.lower()
+    if suffix == '.csv':
+        return CsvSink(path, columns, append)
+    if suffix == '.jsonl':
+        return JsonlSink(path, columns, append)
+    if suffix == '.xlsx':
+        return ExcelSink(path, columns, append)
+    raise ValueError(f"Unsupported output type '{suffix}'. Use one of: {', '.join(SINK_SUFFIXES)}")
+
+
+def close_sink(sink):
+    """Closes a sink and removes its file if no rows were ever written to it."""
+    sink.close()
+    if not sink.rows_written and sink.path.exists():
+        os.remove(sink.path)
+
+
+class OrderedWriter:
+    """
+    Writes rows to a sink in the order of `keys` as soon as every earlier key
+    is settled, so output stays in input order even when parallel browsers
+    finish out of order. Only rows that arrived ahead of an earlier key are
+    held, and each is dropped once written. Safe to call from several threads.
+    """
+
+    def __init__(self, sink, keys):
+        self.sink = sink
+        self.keys = list(dict.fromkeys(keys))
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        self._waiting = {}
+        self._position = 0
+        self._lock = threading.Lock()
+
+    def settle(self, key, row=None):
+        """Marks `key` done with its row, or None when it has nothing to write. Unknown or written keys are ignored."""
+        with self._lock:
+            index = self._index.get(key)
+            if index is None or index < self._position:
+                return
+            self._waiting[key] = row
+            while self._position < len(self.keys) and self.keys[self._position] in self._waiting:
+                row = self._waiting.pop(self.keys[self._position])
+                if row:
+                    self.sink.write(row)
+                self._position += 1
+
+    def finish(self):
+        """Settles every remaining key, e.g. items that failed, and writes what is left."""
+        for key in self.keys[self._position:]:
+            if key not in self._waiting:
+                self.settle(key)
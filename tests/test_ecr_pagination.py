@@ -0,0 +1,121 @@
+"""Page skipping over the ECR listing: _WageMonthOrder, _bisect_to_ecr_window and the DataTable sort check."""
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import engine
+from metrics import NO_METRICS
+from portal import ecr_wage_month_sort
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def month(year, number):
+    return datetime(year, number, 1)
+
+
+def listing_row(wage_month):
+    return ["1", "1234567890123", f"{MONTHS[wage_month.month - 1]}-{wage_month.year}", "Regular"]
+
+
+def newest_first_pages(newest, count, per_page=3):
+    """Pages of wage months going back one month per row from `newest`."""
+    months, year, number = [], newest.year, newest.month
+    for _ in range(count * per_page):
+        months.append(month(year, number))
+        year, number = (year, number - 1) if number > 1 else (year - 1, 12)
+    return [months[i:i + per_page] for i in range(0, len(months), per_page)]
+
+
+class WageMonthOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.start, self.end = month(2024, 4), month(2024, 6)
+
+    def test_newest_first(self):
+        order = engine._WageMonthOrder(self.start, self.end, 'newest_first')
+        self.assertTrue(order.before_window([month(2025, 1), month(2024, 9)]))
+        self.assertFalse(order.before_window([month(2024, 8), month(2024, 6)]))
+        self.assertTrue(order.past_window([month(2024, 3), month(2024, 1)]))
+        self.assertFalse(order.past_window([month(2024, 4), month(2024, 3)]))
+
+    def test_oldest_first(self):
+        order = engine._WageMonthOrder(self.start, self.end, 'oldest_first')
+        self.assertTrue(order.before_window([month(2023, 1), month(2024, 3)]))
+        self.assertFalse(order.before_window([month(2024, 3), month(2024, 4)]))
+        self.assertTrue(order.past_window([month(2024, 7), month(2024, 9)]))
+
+    def test_no_declared_sort_never_skips(self):
+        order = engine._WageMonthOrder(self.start, self.end)
+        order.add([month(2025, 3), month(2025, 2), month(2025, 1)])
+        self.assertFalse(order.before_window([month(2025, 1)]))
+        self.assertFalse(order.past_window([month(2020, 1)]))
+
+    def test_rows_against_the_sort_switch_skipping_off(self):
+        order = engine._WageMonthOrder(self.start, self.end, 'newest_first')
+        # An arrear for an old wage month uploaded between newer ones
+        order.add([month(2025, 3), month(2023, 1), month(2025, 2)])
+        self.assertIsNone(order.direction)
+        self.assertFalse(order.past_window([month(2020, 1)]))
+
+    def test_empty_page_is_never_outside_the_window(self):
+        order = engine._WageMonthOrder(self.start, self.end, 'newest_first')
+        self.assertFalse(order.before_window([]))
+        self.assertFalse(order.past_window([]))
+
+
+class BisectToEcrWindowTest(unittest.TestCase):
+    def bisect(self, pages, start, end):
+        shown = {'page': 0}
+        jumps = []
+
+        def jump(page, index):
+            shown['page'] = index
+            jumps.append(index)
+            return 0
+
+        def read(page, selector):
+            return {'rows': [listing_row(m) for m in pages[shown['page']]]}
+
+        order = engine._WageMonthOrder(start, end, 'newest_first')
+        with mock.patch.object(engine, 'jump_to_ecr_page', jump), mock.patch.object(engine, 'read_table', read):
+            found = engine._bisect_to_ecr_window(None, {'page': 0, 'pages': len(pages)}, order, NO_METRICS)
+        return found, shown['page'], jumps
+
+    def test_finds_first_page_reaching_the_window(self):
+        pages = newest_first_pages(month(2025, 12), 12)
+        found, shown, jumps = self.bisect(pages, month(2025, 2), month(2025, 4))
+        # Page 2 (0-based) holds Jun-2025..Apr-2025, the first to reach the window
+        self.assertEqual(found, 2)
+        self.assertEqual(shown, 2)
+        self.assertLessEqual(len(jumps), 5)
+
+    def test_window_older_than_the_listing(self):
+        pages = newest_first_pages(month(2025, 12), 6)
+        found, _, jumps = self.bisect(pages, month(2010, 1), month(2010, 3))
+        self.assertIsNone(found)
+        self.assertLessEqual(len(jumps), 3)
+
+    def test_window_on_the_last_page(self):
+        pages = newest_first_pages(month(2025, 12), 8)
+        oldest = pages[-1][-1]
+        found, shown, _ = self.bisect(pages, oldest, oldest)
+        self.assertEqual((found, shown), (7, 7))
+
+
+class EcrWageMonthSortTest(unittest.TestCase):
+    def sort(self, reported):
+        page = mock.Mock()
+        page.evaluate.return_value = reported
+        return ecr_wage_month_sort(page)
+
+    def test_wage_month_column(self):
+        self.assertEqual(self.sort({'column': 'Wage Month', 'direction': 'desc'}), 'newest_first')
+        self.assertEqual(self.sort({'column': 'wage month', 'direction': 'asc'}), 'oldest_first')
+
+    def test_other_column_or_no_datatable(self):
+        self.assertIsNone(self.sort({'column': 'Upload Date', 'direction': 'desc'}))
+        self.assertIsNone(self.sort(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Persistent Member Profile lookup cache.
+
+Name, Joining Date and Exit Date for each UAN are kept in a small SQLite
+database with the time they were fetched, so daily runs only go to the
+portal for UANs that are missing or stale. Members without an Exit Date are
+still employed and their record can change, so they expire sooner.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "uan_cache.sqlite3"
+# How long a cached member stays fresh, and the shorter limit for members with no Exit Date yet
+CACHE_TTL_HOURS = float(os.environ.get("EPFO_CACHE_TTL_HOURS", 24 * 30))
+OPEN_MEMBER_TTL_HOURS = float(os.environ.get("EPFO_CACHE_OPEN_TTL_HOURS", 24))
+
+
+class UanCache:
+    def __init__(self, path=CACHE_PATH, ttl_hours=CACHE_TTL_HOURS, open_member_ttl_hours=OPEN_MEMBER_TTL_HOURS):
+        self.ttl = ttl_hours * 3600
+        self.open_member_ttl = open_member_ttl_hours * 3600
+        self._lock = threading.Lock()
+        # Pool threads and the shard coordinator both write results, hence the shared connection + lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS members ("
+            " uan TEXT PRIMARY KEY, name TEXT, joining_date TEXT, exit_date TEXT, fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_fresh(self, uans):
+        """Returns {UAN: record} for the given UANs that are cached and not yet stale."""
+        now = time.time()
+        fresh = {}
+        with self._lock:
+            for chunk_start in range(0, len(uans), 500):
+                chunk = list(uans[chunk_start:chunk_start + 500])
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT uan, name, joining_date, exit_date, fetched_at FROM members WHERE uan IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for uan, name, joining_date, exit_date, fetched_at in rows:
+                    ttl = self.ttl if exit_date else self.open_member_ttl
+                    if now - fetched_at < ttl:
+                        fresh[uan] = {"UAN": uan, "Name": name, "Joining Date": joining_date, "Exit Date": exit_date}
+        logging.info(f"UAN cache: {len(fresh)} of {len(uans)} UANs fresh")
+        return fresh
+
+    def put(self, record):
+        """Stores a freshly fetched Member Profile record."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO members (uan, name, joining_date, exit_date, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (record["UAN"], record["Name"], record["Joining Date"], record["Exit Date"], time.time()),
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,10 @@
+"""
+Queues between the front ends (main.py, cli.py) and the engine's worker thread.
+
+They live apart from engine.py so the GUI can create them and draw its window
+before Playwright is imported.
+"""
+import queue
+
+command_queue = queue.Queue()
+result_queue = queue.Queue()
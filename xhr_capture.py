@@ -0,0 +1,144 @@
+"""
+Reads grid data from the portal's own AJAX responses instead of the rendered cells.
+
+Both the Member Profile DataTable (#memberList) and the Member Service Details
+jqGrid (#profileService) are filled from JSON. A `ResponseCapture` attached to
+a page keeps the XHR/fetch responses it sees; the parsers below turn the
+payloads they recognise into the same records the DOM scraper produces, and
+return None for anything else so the caller can fall back to the DOM.
+"""
+import logging
+import os
+import re
+
+# 'xhr' reads the captured JSON first and falls back to the DOM; 'dom' never listens
+EXTRACTION_BACKENDS = ('xhr', 'dom')
+EXTRACTION_BACKEND = os.environ.get("EPFO_BACKEND", "xhr").lower()
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+class ResponseCapture:
+    """Collects XHR/fetch responses seen by a page until they are taken."""
+
+    def __init__(self, page):
+        self.page = page
+        self._responses = []
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        # Only keep the handle here; the body is read later from the extractor's
+        # own flow, never from inside the event callback
+        if response.request.resource_type in ("xhr", "fetch"):
+            self._responses.append(response)
+
+    def clear(self):
+        self._responses = []
+
+    def take(self):
+        """Returns the JSON payloads received since the last clear/take, oldest first."""
+        responses, self._responses = self._responses, []
+        payloads = []
+        for response in responses:
+            try:
+                payloads.append(response.json())
+            except Exception as e:
+                logging.debug(f"Ignoring non-JSON response from {response.url}: {e}")
+        return payloads
+
+    def detach(self):
+        self.page.remove_listener("response", self._on_response)
+
+
+def _clean(value):
+    return TAG_PATTERN.sub("", "" if value is None else str(value)).strip()
+
+
+def _find_key(keys, *fragments, exclude=()):
+    for key in keys:
+        lowered = key.lower()
+        if any(f in lowered for f in fragments) and not any(x in lowered for x in exclude):
+            return key
+    return None
+
+
+def member_records_from_payload(payload):
+    """
+    Parses a DataTables response ({"data": [...]} or {"aaData": [...]}) from the
+    Member Profile listing into {UAN: record}. Returns None if the shape is unknown.
+    """
+    if not isinstance(payload, dict):
+        return None
+    rows = payload.get('data', payload.get('aaData'))
+    if not isinstance(rows, list):
+        return None
+
+    records = {}
+    for row in rows:
+        if isinstance(row, list) and len(row) >= 7:
+            # Array rows follow the column order of the rendered table
+            cells = [_clean(c) for c in row]
+            uan = next((c for c in cells if re.fullmatch(r"\d{12}", c)), None)
+            name, joining_date, exit_date = cells[1], cells[5], cells[6]
+        elif isinstance(row, dict):
+            keys = list(row)
+            uan_key = _find_key(keys, 'uan')
+            name_key = _find_key(keys, 'name', exclude=('father', 'spouse', 'establishment', 'user'))
+            join_key = _find_key(keys, 'doj', 'join')
+            exit_key = _find_key(keys, 'doe', 'exit', 'leav')
+            if not (uan_key and name_key and join_key and exit_key):
+                return None
+            uan = _clean(row[uan_key])
+            name, joining_date, exit_date = _clean(row[name_key]), _clean(row[join_key]), _clean(row[exit_key])
+        else:
+            return None
+        if uan:
+            records[uan] = {"UAN": uan, "Name": name, "Joining Date": joining_date, "Exit Date": exit_date}
+    return records
+
+
+def member_records_from_payloads(payloads):
+    """Merges every recognised Member Profile payload into one {UAN: record} dict."""
+    records = {}
+    for payload in payloads:
+        parsed = member_records_from_payload(payload)
+        if parsed:
+            records.update(parsed)
+    return records
+
+
+def jqgrid_rows_from_payload(payload, column_names, header_count):
+    """
+    Parses a jqGrid JSON page ({"rows": [{"cell": [...]}, ...], "page", "total"})
+    into lists of cell text matching the rendered headers. Rows given as objects
+    are ordered by `column_names` (the grid's colModel). Returns None if the
+    shape or width does not match.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('rows'), list):
+        return None
+    if not {'page', 'total'} & set(payload):
+        return None
+
+    rows = []
+    for row in payload['rows']:
+        if isinstance(row, dict) and isinstance(row.get('cell'), list):
+            cells = row['cell']
+        elif isinstance(row, list):
+            cells = row
+        elif isinstance(row, dict) and column_names and all(name in row for name in column_names):
+            cells = [row[name] for name in column_names]
+        else:
+            return None
+        if len(cells) != header_count:
+            return None
+        rows.append([_clean(c) for c in cells])
+    return rows
+
+
+def jqgrid_rows_from_payloads(payloads, column_names, header_count):
+    """Returns the rows of the newest recognised jqGrid payload, or None."""
+    for payload in reversed(payloads):
+        rows = jqgrid_rows_from_payload(payload, column_names, header_count)
+        if rows is not None:
+            return rows
+    return None